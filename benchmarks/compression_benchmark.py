@@ -0,0 +1,82 @@
+'''Сравнение затрат CPU и выигрыша в трафике при сжатии списка пользователей.
+
+Запуск из корневой директории проекта:
+
+    python benchmarks/compression_benchmark.py
+'''
+
+import os
+import sys
+import time
+from random import Random
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from core.middlewares.compression import (  # noqa: E402
+    BrotliCompressor,
+    GzipCompressor,
+    brotli,
+)
+from users import schemas  # noqa: E402
+
+
+PAGE_SIZES = (100, 1000, 10000)
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_LEVELS = (1, 4, 11)
+REPEATS = 5
+
+
+def make_payload(size: int) -> bytes:
+    '''Тело ответа GET /private/users с size пользователями.'''
+    rnd = Random(size)
+    users = [
+        schemas.UsersListElementModel(
+            id=i,
+            first_name=rnd.choice(['Ivan', 'Petr', 'Anna', 'Olga']),
+            last_name=rnd.choice(['Ivanov', 'Petrova', 'Sidorov']),
+            email=f'user{i}@example.com',
+        )
+        for i in range(1, size + 1)
+    ]
+    cities = [schemas.CitiesHintModel(id=i, name=f'City {i}')
+              for i in range(1, 11)]
+    response = schemas.PrivateUsersListResponseModel(
+        data=users,
+        meta=schemas.PrivateUsersListMetaDataModel(
+            pagination=schemas.PaginatedMetaDataModel(
+                total=size, page=1, size=size
+            ),
+            hint=schemas.PrivateUsersListHintMetaModel(city=cities),
+        ),
+    )
+    return response.json().encode()
+
+
+def measure(compressor_class, level: int, payload: bytes):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        compressed = compressor_class(level).finish(payload)
+    elapsed_ms = (time.perf_counter() - started) / REPEATS * 1000
+    return len(compressed), elapsed_ms
+
+
+def main() -> None:
+    codecs = [(GzipCompressor, level) for level in GZIP_LEVELS]
+    if brotli:
+        codecs += [(BrotliCompressor, level) for level in BROTLI_LEVELS]
+    else:
+        print('brotli не установлен, измеряется только gzip\n')
+    print(f'{"size":>6} {"codec":>8} {"raw, KB":>9} {"out, KB":>9} '
+          f'{"ratio":>6} {"ms":>8}')
+    for size in PAGE_SIZES:
+        payload = make_payload(size)
+        for compressor_class, level in codecs:
+            out_size, elapsed_ms = measure(compressor_class, level, payload)
+            codec = f'{compressor_class.encoding}-{level}'
+            print(f'{size:>6} {codec:>8} {len(payload) / 1024:>9.1f} '
+                  f'{out_size / 1024:>9.1f} '
+                  f'{len(payload) / out_size:>6.1f} {elapsed_ms:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+'''Планы и время поиска пользователя по логину без учета регистра на
+большой таблице: фильтр lower(email) = ? без функционального индекса
+(полный просмотр таблицы) и с индексом ix_users_email_lower.
+
+Запуск из корневой директории проекта:
+
+    python benchmarks/login_plan_benchmark.py
+'''
+
+import os
+import sys
+import time
+
+os.environ.setdefault('DEBUG', 'True')
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from core.database import Base  # noqa: E402
+from users import repository  # noqa: E402
+from users.models import User  # noqa: E402
+
+
+USERS_COUNT = 200_000
+CALLS = 200
+
+
+def explain(login: str, db: Session) -> str:
+    '''План SQLite для запроса входа из users/repository.py'''
+    compiled = repository.user_by_login_statement.compile(
+        dialect=db.get_bind().dialect
+    )
+    params = compiled.construct_params({'login': login.lower()})
+    rows = db.connection().exec_driver_sql(
+        f'EXPLAIN QUERY PLAN {compiled}',
+        tuple(params[name] for name in compiled.positiontup)
+    )
+    return '; '.join(row[-1] for row in rows)
+
+
+def measure(db: Session) -> float:
+    '''Среднее время одного поиска в микросекундах'''
+    started = time.perf_counter()
+    for i in range(CALLS):
+        repository.get_user_by_login(f'User{i * 97 % USERS_COUNT}@X.com', db)
+    return (time.perf_counter() - started) / CALLS * 1_000_000
+
+
+def main() -> None:
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.execute(insert(User), [
+            {'first_name': 'Ivan', 'last_name': 'Ivanov',
+             'email': f'user{i}@x.com', 'hashed_password': 'hash',
+             'role': 'User'}
+            for i in range(USERS_COUNT)
+        ])
+        db.commit()
+        login = f'User{USERS_COUNT - 1}@X.com'
+        email_index = next(index for index in User.__table__.indexes
+                           if index.name == 'ix_users_email_lower')
+        # Сначала без функционального индекса, затем с ним
+        email_index.drop(db.connection())
+        cases = [('без индекса', explain(login, db), measure(db))]
+        email_index.create(db.connection())
+        cases.append(('ix_users_email_lower', explain(login, db),
+                      measure(db)))
+        print(f'users: {USERS_COUNT}')
+        for name, plan, lookup_us in cases:
+            print(f'{name:<22} {lookup_us:>10.1f} us  {plan}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+'''Накладные расходы на вызов горячих запросов: прежние конструкции
+db.query(...).filter(...).first() против кешированных select()
+из users/repository.py. Используется SQLite в памяти, чтобы время
+выполнения самого запроса в СУБД было минимальным.
+
+Запуск из корневой директории проекта:
+
+    python benchmarks/lookup_benchmark.py
+'''
+
+import os
+import sys
+import time
+from typing import Callable
+
+os.environ.setdefault('DEBUG', 'True')
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine, func  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from core.database import Base  # noqa: E402
+from users import repository  # noqa: E402
+from users.models import City, User  # noqa: E402
+
+
+USERS_COUNT = 1000
+CALLS = 20000
+
+
+def legacy_user_by_id(id: int, db: Session):
+    return db.query(User).filter(User.id == id).first()
+
+
+def legacy_user_by_login(login: str, db: Session):
+    # Тот же фильтр, что и в repository, чтобы оба варианта шли по
+    # индексу ix_users_email_lower и сравнивались только накладные расходы
+    return db.query(User) \
+        .filter(func.lower(User.email) == login.lower()).first()
+
+
+def legacy_city_by_id(id: int, db: Session):
+    return db.query(City).filter(City.id == id).first()
+
+
+def measure(lookup: Callable, make_key: Callable, db: Session) -> float:
+    '''Среднее время одного вызова в микросекундах'''
+    # Прогрев: первый вызов компилирует запрос и заполняет кеш
+    lookup(make_key(0), db)
+    started = time.perf_counter()
+    for i in range(CALLS):
+        lookup(make_key(i), db)
+        # Сбрасываем карту идентичности, как при новой сессии на запрос
+        db.expunge_all()
+    return (time.perf_counter() - started) / CALLS * 1_000_000
+
+
+def main() -> None:
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all(City(name=f'City {i}') for i in range(10))
+        db.add_all(
+            User(first_name='Ivan', last_name='Ivanov', email=f'u{i}@x.com',
+                 hashed_password='hash', role='User', city_id=i % 10 + 1,
+                 additional_info='x' * 1000)
+            for i in range(USERS_COUNT)
+        )
+        db.commit()
+
+        def user_id(i: int) -> int:
+            return i % USERS_COUNT + 1
+
+        def login(i: int) -> str:
+            return f'u{i % USERS_COUNT}@x.com'
+
+        def city_id(i: int) -> int:
+            return i % 10 + 1
+
+        cases = [
+            ('user by id', legacy_user_by_id,
+             repository.get_user_by_id, user_id),
+            ('user by id (auth)', legacy_user_by_id,
+             repository.get_auth_user, user_id),
+            ('user by login', legacy_user_by_login,
+             repository.get_user_by_login, login),
+            ('city by id', legacy_city_by_id,
+             repository.get_city_by_id, city_id),
+        ]
+        print(f'{"lookup":<20} {"legacy, us":>11} {"cached, us":>11} '
+              f'{"speedup":>8}')
+        for name, legacy, cached, make_key in cases:
+            legacy_us = measure(legacy, make_key, db)
+            cached_us = measure(cached, make_key, db)
+            print(f'{name:<20} {legacy_us:>11.1f} {cached_us:>11.1f} '
+                  f'{legacy_us / cached_us:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
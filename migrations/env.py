@@ -9,7 +9,7 @@ from alembic import context
 
 sys.path.append(os.path.join(sys.path[0], 'src'))
 
-from src.core.config import db_engine_settings
+from src.core.config import db_engine_settings, db_shards_settings
 from src.core.database import Base
 from src.users.models import User, City
 
@@ -68,19 +68,23 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
-    connectable = engine_from_config(
-        config.get_section(config.config_ini_section, {}),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
-
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
+    # Схема всех шардов пользователей одинакова, поэтому миграции
+    # применяются к основной базе и к каждому дополнительному шарду
+    for url in db_shards_settings:
+        connectable = engine_from_config(
+            config.get_section(config.config_ini_section, {}),
+            prefix="sqlalchemy.",
+            poolclass=pool.NullPool,
+            url=url,
         )
 
-        with context.begin_transaction():
-            context.run_migrations()
+        with connectable.connect() as connection:
+            context.configure(
+                connection=connection, target_metadata=target_metadata
+            )
+
+            with context.begin_transaction():
+                context.run_migrations()
 
 
 if context.is_offline_mode():
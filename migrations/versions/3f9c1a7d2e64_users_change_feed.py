@@ -0,0 +1,50 @@
+"""Users change feed
+
+Revision ID: 3f9c1a7d2e64
+Revises: b16eb0a7e55b
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c1a7d2e64'
+down_revision = 'b16eb0a7e55b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('created_at', sa.DateTime(),
+                                     nullable=True))
+    op.add_column('users', sa.Column('updated_at', sa.DateTime(),
+                                     nullable=True))
+    op.add_column('users', sa.Column('change_seq', sa.Integer(),
+                                     server_default='0', nullable=False))
+    op.execute('UPDATE users SET created_at = CURRENT_TIMESTAMP, '
+               'updated_at = CURRENT_TIMESTAMP')
+    op.create_index('ix_users_change_seq', 'users',
+                    ['change_seq', 'id'], unique=False)
+    op.create_table('user_change_sequence',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sqlite_autoincrement=True
+        )
+    op.create_table('user_tombstones',
+        sa.Column('change_seq', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('change_seq', 'user_id')
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('user_tombstones')
+    op.drop_table('user_change_sequence')
+    op.drop_index('ix_users_change_seq', table_name='users')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('change_seq')
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('created_at')
@@ -0,0 +1,51 @@
+"""Users change counter
+
+Revision ID: 5a7c9e1b3d20
+Revises: 9b6d3c2a51f7
+Create Date: 2026-10-19 13:51:41.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a7c9e1b3d20'
+down_revision = '9b6d3c2a51f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('user_change_counter',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+    # Счетчик продолжает уже выданные номера изменений
+    if op.get_bind().dialect.name == 'postgresql':
+        greatest = 'GREATEST'
+    else:
+        greatest = 'MAX'
+    op.execute('INSERT INTO user_change_counter (id, value) '
+               f'SELECT 1, {greatest}('
+               'COALESCE((SELECT MAX(change_seq) FROM users), 0), '
+               'COALESCE((SELECT MAX(change_seq) FROM user_tombstones), 0))')
+    op.drop_table('user_change_sequence')
+
+
+def downgrade() -> None:
+    op.create_table('user_change_sequence',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sqlite_autoincrement=True
+        )
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("SELECT setval(pg_get_serial_sequence("
+                   "'user_change_sequence', 'id'), value) "
+                   "FROM user_change_counter WHERE value > 0")
+    else:
+        op.execute('INSERT INTO user_change_sequence (id) SELECT value '
+                   'FROM user_change_counter WHERE value > 0')
+        op.execute('DELETE FROM user_change_sequence')
+    op.drop_table('user_change_counter')
@@ -0,0 +1,42 @@
+"""Users sharding
+
+Revision ID: 8d2b4e61c0a9
+Revises: 3f9c1a7d2e64
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2b4e61c0a9'
+down_revision = '3f9c1a7d2e64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('user_id_sequence',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sqlite_autoincrement=True
+        )
+    op.create_table('user_logins',
+        sa.Column('login', sa.String(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('login')
+        )
+    # Глобальные ID продолжают уже выданные в основной базе
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("SELECT setval(pg_get_serial_sequence('user_id_sequence', "
+                   "'id'), MAX(id)) FROM users")
+    else:
+        op.execute('INSERT INTO user_id_sequence (id) SELECT MAX(id) '
+                   'FROM users HAVING MAX(id) IS NOT NULL')
+        op.execute('DELETE FROM user_id_sequence')
+
+
+def downgrade() -> None:
+    op.drop_table('user_logins')
+    op.drop_table('user_id_sequence')
@@ -0,0 +1,40 @@
+"""Users birthday key
+
+Revision ID: 9b6d3c2a51f7
+Revises: e4a1f7b92c35
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b6d3c2a51f7'
+down_revision = 'e4a1f7b92c35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('birthday_key', sa.Integer(),
+                                     nullable=True))
+    # Ключ дня рождения без года: месяц * 100 + день
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('UPDATE users SET birthday_key = '
+                   'EXTRACT(MONTH FROM birthday) * 100 '
+                   '+ EXTRACT(DAY FROM birthday) '
+                   'WHERE birthday IS NOT NULL')
+    else:
+        op.execute("UPDATE users SET birthday_key = "
+                   "CAST(strftime('%m', birthday) AS INTEGER) * 100 "
+                   "+ CAST(strftime('%d', birthday) AS INTEGER) "
+                   "WHERE birthday IS NOT NULL")
+    op.create_index('ix_users_birthday_key', 'users',
+                    ['birthday_key', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_birthday_key', table_name='users')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('birthday_key')
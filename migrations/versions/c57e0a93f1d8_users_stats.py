@@ -0,0 +1,42 @@
+"""Users stats
+
+Revision ID: c57e0a93f1d8
+Revises: 8d2b4e61c0a9
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c57e0a93f1d8'
+down_revision = '8d2b4e61c0a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('user_stats',
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('dimension', 'key')
+        )
+    # Заполнение счетчиков по уже существующим пользователям шарда
+    if op.get_bind().dialect.name == 'postgresql':
+        month = 'CAST(EXTRACT(MONTH FROM birthday) AS INTEGER)'
+    else:
+        month = "CAST(strftime('%m', birthday) AS INTEGER)"
+    for dimension, key in (('city', 'city_id'),
+                           ('role', 'role'),
+                           ('birthday_month', month)):
+        op.execute(
+            "INSERT INTO user_stats (dimension, key, count) "
+            f"SELECT '{dimension}', COALESCE(CAST({key} AS TEXT), ''), "
+            f"COUNT(*) FROM users GROUP BY {key}"
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('user_stats')
@@ -0,0 +1,31 @@
+"""Users email lower index
+
+Revision ID: e4a1f7b92c35
+Revises: c57e0a93f1d8
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a1f7b92c35'
+down_revision = 'c57e0a93f1d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Адреса, отличающиеся только регистром, нужно объединить заранее,
+    # иначе создание уникального индекса завершится ошибкой
+    op.execute('UPDATE users SET email = lower(email)')
+    op.execute('UPDATE user_logins SET login = lower(login)')
+    op.drop_index('ix_users_email', table_name='users')
+    op.create_index('ix_users_email_lower', 'users',
+                    [sa.text('lower(email)')], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_email_lower', table_name='users')
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
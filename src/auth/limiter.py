@@ -0,0 +1,151 @@
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, List, Sequence, Tuple
+
+from fastapi import HTTPException, status
+
+from core.config import (
+    LOGIN_RATE_LIMIT_PER_IP,
+    LOGIN_RATE_LIMIT_PER_LOGIN,
+    LOGIN_RATE_LIMIT_PERIOD,
+    PASSWORD_VERIFY_CONCURRENCY,
+    PASSWORD_VERIFY_WAIT_TIMEOUT,
+)
+from core.metrics import metrics
+
+
+def too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail='Слишком много попыток входа. Повторите попытку позже.',
+        headers={'Retry-After': str(max(1, math.ceil(retry_after)))}
+    )
+
+
+# Корзина токенов: ключ, емкость и скорость восполнения (токенов в секунду)
+Bucket = Tuple[str, int, float]
+
+
+class RateLimitBackend(ABC):
+    '''Хранилище корзин токенов. Для нескольких процессов
+    достаточно реализовать consume поверх общего хранилища.'''
+
+    @abstractmethod
+    def consume(self, buckets: Sequence[Bucket]) -> List[float]:
+        '''Атомарно списывает по токену из каждой корзины, только если
+        токены есть во всех. Возвращает для каждой корзины 0 или число
+        секунд до появления в ней следующего токена; если хотя бы одно
+        значение не 0, ни один токен не списан.'''
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    '''Корзины токенов в памяти процесса с LRU-вытеснением.'''
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+        self._max_keys = max_keys
+        self._lock = threading.Lock()
+
+    def consume(self, buckets: Sequence[Bucket]) -> List[float]:
+        with self._lock:
+            now = time.monotonic()
+            tokens = [self._refill(key, capacity, refill_rate, now)
+                      for key, capacity, refill_rate in buckets]
+            retry_afters = [
+                0.0 if available >= 1 else (1 - available) / refill_rate
+                for available, (_, _, refill_rate) in zip(tokens, buckets)
+            ]
+            spent = 0 if any(retry_afters) else 1
+            for (key, _, _), available in zip(buckets, tokens):
+                self._store(key, available - spent, now)
+            return retry_afters
+
+    def _refill(self,
+                key: str,
+                capacity: int,
+                refill_rate: float,
+                now: float) -> float:
+        tokens, updated_at = self._buckets.pop(key, (capacity, now))
+        return min(capacity, tokens + (now - updated_at) * refill_rate)
+
+    def _store(self, key: str, tokens: float, now: float) -> None:
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self._max_keys:
+            self._buckets.popitem(last=False)
+
+
+class TokenBucketLimiter:
+    def __init__(self,
+                 name: str,
+                 capacity: int,
+                 period: float,
+                 backend: RateLimitBackend) -> None:
+        self.name = name
+        self.capacity = capacity
+        self.refill_rate = capacity / period
+        self.backend = backend
+
+    def bucket(self, key: str) -> Bucket:
+        return f'{self.name}:{key}', self.capacity, self.refill_rate
+
+
+def hit_limiters(*hits: Tuple[TokenBucketLimiter, str]) -> None:
+    '''Учитывает попытку сразу во всех лимитах (с общим хранилищем),
+    при превышении любого выбрасывает исключение 429. Токены списываются
+    только если попытку пропускают все лимиты: отклоненная попытка
+    не расходует лимиты остальных ключей.'''
+    limiters = [limiter for limiter, _ in hits]
+    retry_afters = limiters[0].backend.consume(
+        [limiter.bucket(key) for limiter, key in hits]
+    )
+    for limiter, retry_after in zip(limiters, retry_afters):
+        if retry_after:
+            metrics.inc(f'auth.login.rate_limited.{limiter.name}')
+    if any(retry_afters):
+        raise too_many_requests(max(retry_afters))
+
+
+class ConcurrencyGate:
+    '''Ограничение числа одновременно выполняемых операций: запрос
+    ждет свободного слота не дольше wait_timeout секунд, затем получает
+    429. Короткое ожидание сглаживает всплески одновременных входов.'''
+
+    def __init__(self, name: str, limit: int, wait_timeout: float) -> None:
+        self.name = name
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(limit)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            metrics.inc(f'{self.name}.rejected')
+            raise too_many_requests(1)
+        metrics.inc(f'{self.name}.admitted')
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+backend: RateLimitBackend = InMemoryRateLimitBackend()
+
+ip_limiter = TokenBucketLimiter(
+    'ip', LOGIN_RATE_LIMIT_PER_IP, LOGIN_RATE_LIMIT_PERIOD, backend
+)
+login_limiter = TokenBucketLimiter(
+    'login', LOGIN_RATE_LIMIT_PER_LOGIN, LOGIN_RATE_LIMIT_PERIOD, backend
+)
+password_verify_gate = ConcurrencyGate(
+    'auth.password_verify', PASSWORD_VERIFY_CONCURRENCY,
+    PASSWORD_VERIFY_WAIT_TIMEOUT
+)
+
+
+def check_login_attempt(client_ip: str, login: str) -> None:
+    '''Проверка лимитов попыток входа до проверки пароля.'''
+    metrics.inc('auth.login.attempts')
+    hit_limiters((ip_limiter, client_ip), (login_limiter, login.lower()))
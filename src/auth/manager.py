@@ -1,15 +1,17 @@
-from typing import Final
+from typing import Final, Optional
 
 from fastapi import HTTPException, status
 from fastapi_jwt_auth import AuthJWT
 from fastapi_jwt_auth.exceptions import JWTDecodeError
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from core.config import AUTH_JWT_SECRET_KEY
 
-from users.models import User, UserRole
-from users.utils import get_user_by_id, get_user_by_login
+from users.models import UserRole, verify_password
+from users.repository import get_auth_user
+from .limiter import password_verify_gate
 
 
 ACCESS_TOKEN_NAME: Final[str] = 'access_token_cookie'
@@ -34,11 +36,18 @@ def get_config():
     return Settings()
 
 
-def authenticate_user(login: str, password: str, db: Session) -> User:
-    '''Функция аутентификации пользователя для логина.'''
-    user = get_user_by_login(login, db)
-    if user and not user.verify_password(password):
-        user = None
+def authenticate_user(user: Optional[Row], password: str) -> Row:
+    '''Функция аутентификации пользователя, найденного по логину.
+
+    Пользователь ищется заранее (см. users.repository.get_user_by_login),
+    чтобы вызывающий мог вернуть соединение с БД в пул до медленной
+    проверки пароля.
+    '''
+    if user:
+        # Ограничиваем число одновременных проверок пароля (bcrypt)
+        with password_verify_gate.slot():
+            if not verify_password(password, user.hashed_password):
+                user = None
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -49,7 +58,7 @@ def authenticate_user(login: str, password: str, db: Session) -> User:
 
 def check_jwt_user(Authorize: AuthJWT,
                    db: Session,
-                   permissions: set = (UserRole.basic)) -> User:
+                   permissions: set = (UserRole.basic)) -> Row:
     '''Функция проверки текущего пользователя по JWT токену.'''
     # Проверяем аутентификацию пользователя через куки
     try:
@@ -61,7 +70,7 @@ def check_jwt_user(Authorize: AuthJWT,
         )
     # Получаем идентификатор пользователя из JWT и информацию о нем
     user_id = Authorize.get_jwt_subject()
-    user = get_user_by_id(user_id, db)
+    user = get_auth_user(int(user_id), db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 
 import core.database as db
+from core.database import release_db
 import core.handlers.exceptions as exc
+from .limiter import check_login_attempt
 from .manager import AuthJWT, authenticate_user
+from users.models import UserRole
+from users.repository import get_user_by_login
 from users.schemas import CurrentUserResponseModel
 
 
@@ -26,12 +30,20 @@ class LoginModel(BaseModel):
              status_code=status.HTTP_200_OK,
              response_model=CurrentUserResponseModel,
              responses={400: {"model": exc.ErrorResponseModel},
-                        401: {"model": exc.CodelessErrorResponseModel}})
+                        401: {"model": exc.CodelessErrorResponseModel},
+                        429: {"model": exc.CodelessErrorResponseModel}})
 def login(user: LoginModel,
+          request: Request,
           Authorize: AuthJWT = Depends(),
           db: Session = Depends(db.get_db)):
-    # Аутентификация пользователя
-    auth_user = authenticate_user(user.login, user.password, db)
+    # Проверяем лимиты попыток входа до дорогой проверки пароля
+    client_ip = request.client.host if request.client else 'unknown'
+    check_login_attempt(client_ip, user.login)
+    # Аутентификация пользователя; соединение с БД не держим во время
+    # проверки пароля
+    db_user = get_user_by_login(user.login, db)
+    release_db(db)
+    auth_user = authenticate_user(db_user, user.password)
     # Формирование модели ответа
     response = CurrentUserResponseModel(
         first_name=auth_user.first_name,
@@ -40,7 +52,7 @@ def login(user: LoginModel,
         email=auth_user.email,
         phone=auth_user.phone,
         birthday=auth_user.birthday,
-        is_admin=auth_user.is_superuser()
+        is_admin=auth_user.role == UserRole.superuser
     )
     # Создаем access и refresh токены
     current_user_subject = str(auth_user.id)
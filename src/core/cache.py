@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from core.metrics import metrics
+
+
+class ResponseCache:
+    '''Кеш сериализованных ответов в памяти процесса.
+
+    Объем ограничен суммарным размером тел ответов (вытесняются давно
+    неиспользованные записи), каждая запись живет не дольше ttl секунд.
+    Поколение generation увеличивается при каждой очистке: ответ,
+    сформированный до изменения данных, в кеш уже не попадет.
+    '''
+
+    def __init__(self, name: str, max_bytes: int, ttl: float) -> None:
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.generation = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[float, bytes]]' = \
+            OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._entries.move_to_end(key)
+            self._report()
+        return entry[1] if entry else None
+
+    def set(self, key: Hashable, body: bytes, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation or len(body) > self.max_bytes:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, body)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                metrics.inc(f'{self.name}.evictions')
+            self._report()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._size = 0
+            metrics.inc(f'{self.name}.invalidations')
+            self._report()
+
+    def _remove(self, key: Hashable) -> None:
+        _, body = self._entries.pop(key)
+        self._size -= len(body)
+
+    def _report(self) -> None:
+        requests = self._hits + self._misses
+        metrics.set(f'{self.name}.hits', self._hits)
+        metrics.set(f'{self.name}.misses', self._misses)
+        metrics.set(f'{self.name}.hit_ratio',
+                    self._hits / requests if requests else 0)
+        metrics.set(f'{self.name}.entries', len(self._entries))
+        metrics.set(f'{self.name}.bytes', self._size)
@@ -24,7 +24,8 @@ AUTH_JWT_SECRET_KEY: str = os.getenv('AUTH_JWT_SECRET_KEY')
 
 # Базы данных.
 
-DATABASES_DIR: str = os.path.join(BASE_DIR, 'databases')
+DATABASES_DIR: str = os.getenv('DATABASES_DIR',
+                               os.path.join(BASE_DIR, 'databases'))
 
 if DEBUG:
     os.makedirs(DATABASES_DIR, exist_ok=True)
@@ -39,3 +40,92 @@ else:
     database = os.getenv('DATABASE')
     connection_params = f'{user}:{password}@{host}:{port}/{database}'
     db_engine_settings = f'postgresql://{connection_params}'
+
+# Шардирование пользователей: строки users распределяются по хешу ID
+# между основной базой (шард 0) и дополнительными базами. Основная база
+# также хранит глобальные счетчики и исходный справочник городов.
+if DEBUG:
+    # Локально шарды - отдельные файлы SQLite рядом с основной базой
+    USERS_SHARDS: int = int(os.getenv('USERS_SHARDS', '1'))
+    db_shards_settings = [db_engine_settings] + [
+        'sqlite:///{}'.format(
+            os.path.join(DATABASES_DIR, f'app_shard_{number}.db')
+        )
+        for number in range(1, USERS_SHARDS)
+    ]
+else:
+    # Строки подключения дополнительных баз через запятую
+    shards_urls = os.getenv('USERS_SHARDS_DATABASES', '')
+    db_shards_settings = [db_engine_settings] + [
+        url.strip() for url in shards_urls.split(',') if url.strip()
+    ]
+
+
+# Ограничение частоты попыток входа в систему.
+
+# Емкость корзины токенов (число попыток) и период ее полного восполнения
+LOGIN_RATE_LIMIT_PER_IP: int = int(os.getenv('LOGIN_RATE_LIMIT_PER_IP', '30'))
+LOGIN_RATE_LIMIT_PER_LOGIN: int = \
+    int(os.getenv('LOGIN_RATE_LIMIT_PER_LOGIN', '5'))
+LOGIN_RATE_LIMIT_PERIOD: float = \
+    float(os.getenv('LOGIN_RATE_LIMIT_PERIOD', '60'))
+
+# Максимальное число одновременных проверок пароля (bcrypt)
+PASSWORD_VERIFY_CONCURRENCY: int = int(
+    os.getenv('PASSWORD_VERIFY_CONCURRENCY', str(os.cpu_count() or 1))
+)
+# Сколько секунд запрос ждет свободного слота проверки пароля до ответа 429
+PASSWORD_VERIFY_WAIT_TIMEOUT: float = \
+    float(os.getenv('PASSWORD_VERIFY_WAIT_TIMEOUT', '2'))
+
+
+# Сжатие ответов.
+
+# Минимальный размер тела ответа в байтах, начиная с которого оно сжимается
+COMPRESSION_MINIMUM_SIZE: int = \
+    int(os.getenv('COMPRESSION_MINIMUM_SIZE', '1000'))
+# Уровни сжатия: gzip - от 1 до 9, brotli - от 0 до 11
+GZIP_COMPRESSION_LEVEL: int = int(os.getenv('GZIP_COMPRESSION_LEVEL', '6'))
+BROTLI_COMPRESSION_LEVEL: int = \
+    int(os.getenv('BROTLI_COMPRESSION_LEVEL', '4'))
+
+
+# Пакетные операции администратора.
+
+# Максимальное число ID в одном пакетном запросе
+BATCH_MAX_IDS: int = int(os.getenv('BATCH_MAX_IDS', '500'))
+# Размер пачки строк, изменяемых одним UPDATE/DELETE в массовых операциях
+BULK_CHUNK_SIZE: int = int(os.getenv('BULK_CHUNK_SIZE', '1000'))
+
+
+# Кеш страниц списка пользователей.
+
+# Объем памяти под сериализованные страницы в байтах
+USERS_PAGES_CACHE_MAX_BYTES: int = \
+    int(os.getenv('USERS_PAGES_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+# Время жизни страницы в секундах на случай изменений из других процессов
+USERS_PAGES_CACHE_TTL: float = float(os.getenv('USERS_PAGES_CACHE_TTL', '30'))
+# Кешируются только первые страницы, к которым обращаются чаще всего
+USERS_PAGES_CACHE_MAX_PAGE: int = \
+    int(os.getenv('USERS_PAGES_CACHE_MAX_PAGE', '10'))
+
+
+# Объединение одинаковых запросов на чтение.
+
+# Сколько секунд запрос ждет результата такого же выполняющегося запроса,
+# прежде чем выполнить его сам
+SINGLEFLIGHT_WAIT_TIMEOUT: float = \
+    float(os.getenv('SINGLEFLIGHT_WAIT_TIMEOUT', '5'))
+
+
+# Ограничение одновременных запросов по классам маршрутов.
+
+# Число запросов, обрабатываемых одновременно, для каждого класса маршрутов
+AUTH_CONCURRENCY_LIMIT: int = int(os.getenv('AUTH_CONCURRENCY_LIMIT', '8'))
+READ_CONCURRENCY_LIMIT: int = int(os.getenv('READ_CONCURRENCY_LIMIT', '20'))
+WRITE_CONCURRENCY_LIMIT: int = int(os.getenv('WRITE_CONCURRENCY_LIMIT', '8'))
+BULK_CONCURRENCY_LIMIT: int = int(os.getenv('BULK_CONCURRENCY_LIMIT', '2'))
+# Сколько запросов каждого класса может ждать в очереди и как долго
+CONCURRENCY_QUEUE_SIZE: int = int(os.getenv('CONCURRENCY_QUEUE_SIZE', '50'))
+CONCURRENCY_QUEUE_TIMEOUT: float = \
+    float(os.getenv('CONCURRENCY_QUEUE_TIMEOUT', '5'))
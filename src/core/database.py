@@ -1,7 +1,20 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from typing import Any, Dict, Iterator, List, Optional
+from zlib import crc32
 
-from .config import db_engine_settings
+from sqlalchemy import Engine, Table, create_engine, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import (
+    Mapper,
+    ORMExecuteState,
+    Session,
+    sessionmaker,
+    declarative_base,
+)
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+
+from .config import db_engine_settings, db_shards_settings
 
 
 # создаем базовый класс для определения моделей таблиц
@@ -10,15 +23,182 @@ Base = declarative_base()
 # создаем подключение к базе данных
 engine = create_engine(db_engine_settings, echo=True)
 
-# создаем объект сессии базы данных
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-session = SessionLocal()
+# подключения к шардам; шард '0' - основная база
+shard_engines: Dict[str, Engine] = {'0': engine}
+for number, url in enumerate(db_shards_settings[1:], start=1):
+    shard_engines[str(number)] = create_engine(url, echo=True)
+
+USERS_SHARDED: bool = len(shard_engines) > 1
+
+# Ключ в Table.info со столбцом, по хешу которого строки таблицы
+# распределяются между шардами; таблицы без ключа живут в основной базе
+SHARD_KEY = 'shard_key'
+
+
+def shard_for(value: Any) -> str:
+    '''Шард, в котором хранится строка с данным значением ключа'''
+    return str(crc32(str(value).encode()) % len(shard_engines))
+
+
+def get_shard_key(mapper: Optional[Mapper]) -> Optional[str]:
+    if mapper is None:
+        return None
+    return mapper.local_table.info.get(SHARD_KEY)
+
+
+def shard_chooser(mapper: Mapper, instance: Any, **kw) -> str:
+    '''Шард для записи объекта при сохранении сессии'''
+    shard_key = get_shard_key(mapper)
+    if shard_key is None or instance is None:
+        return '0'
+    return shard_for(getattr(instance, shard_key))
+
+
+def identity_chooser(mapper: Mapper, primary_key: Any, **kw) -> List[str]:
+    '''Шарды, в которых может находиться объект с данным первичным ключом'''
+    shard_key = get_shard_key(mapper)
+    if shard_key is None:
+        return ['0']
+    for column, value in zip(mapper.primary_key, primary_key):
+        if column.key == shard_key:
+            return [shard_for(value)]
+    return list(shard_engines)
+
+
+def get_condition_values(condition: Any,
+                         parameters: Any,
+                         column_key: str) -> List[Any]:
+    '''Значения столбца из условия column = x или column IN (...)'''
+    if not isinstance(condition, BinaryExpression) \
+            or not isinstance(condition.right, BindParameter) \
+            or getattr(condition.left, 'key', None) != column_key:
+        return []
+    value = condition.right.value
+    if value is None and isinstance(parameters, dict):
+        value = parameters.get(condition.right.key)
+    if condition.operator is operators.eq and value is not None:
+        return [value]
+    if condition.operator is operators.in_op and value:
+        return list(value)
+    return []
+
+
+def get_shard_key_values(orm_context: ORMExecuteState,
+                         table: Table,
+                         shard_key: str) -> List[Any]:
+    '''Значения ключа шардирования из условий вида key = x и key IN (...),
+    объединенных через AND в WHERE запроса'''
+    whereclause = getattr(orm_context.statement, 'whereclause', None)
+    if whereclause is None:
+        return []
+    if getattr(whereclause, 'operator', None) is operators.and_:
+        conditions = whereclause.clauses
+    else:
+        conditions = [whereclause]
+    for condition in conditions:
+        if getattr(getattr(condition, 'left', None), 'table', None) \
+                is not table:
+            continue
+        values = get_condition_values(
+            condition, orm_context.parameters, shard_key
+        )
+        if values:
+            return values
+    return []
+
+
+def execute_chooser(orm_context: ORMExecuteState) -> List[str]:
+    '''Шарды для выполнения запроса: по ключу из условий запроса или все
+    шарды (scatter-gather); результаты шардов идут подряд'''
+    mapper = orm_context.bind_mapper
+    shard_key = get_shard_key(mapper)
+    if shard_key is None:
+        return ['0']
+    values = get_shard_key_values(orm_context, mapper.local_table, shard_key)
+    if values:
+        return sorted({shard_for(value) for value in values})
+    return list(shard_engines)
+
+
+# создаем фабрику сессий базы данных
+if USERS_SHARDED:
+    SessionLocal = sessionmaker(
+        class_=ShardedSession,
+        autocommit=False,
+        autoflush=False,
+        shards=shard_engines,
+        shard_chooser=shard_chooser,
+        identity_chooser=identity_chooser,
+        execute_chooser=execute_chooser,
+    )
+else:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def replicate_rows(shard_engine: Engine,
+                   table: Table,
+                   rows: List[Dict[str, Any]]) -> None:
+    '''Запись строк справочника в шард: новые добавляются, имеющиеся
+    обновляются'''
+    (primary_key,) = table.primary_key.columns
+    keys = [row[primary_key.key] for row in rows]
+    with shard_engine.begin() as target:
+        existing = set(target.scalars(
+            select(primary_key).where(primary_key.in_(keys))
+        ))
+        new_rows = [row for row in rows
+                    if row[primary_key.key] not in existing]
+        if new_rows:
+            target.execute(insert(table), new_rows)
+        for row in rows:
+            if row[primary_key.key] in existing:
+                target.execute(
+                    update(table)
+                    .where(primary_key == row[primary_key.key])
+                    .values(row)
+                )
+
+
+def replicate_table(table: Table, *conditions: Any) -> None:
+    '''Копирование справочника (или его строк, отобранных условиями)
+    из основной базы во все шарды, чтобы связанные строки читались из того
+    же шарда, что и пользователь'''
+    with engine.connect() as source:
+        rows = [dict(row) for row in
+                source.execute(select(table).where(*conditions)).mappings()]
+    if not rows:
+        return
+    for shard_id, shard_engine in shard_engines.items():
+        if shard_id == '0':
+            continue
+        try:
+            replicate_rows(shard_engine, table, rows)
+        except IntegrityError:
+            # Строку одновременно скопировал другой запрос
+            # с теми же данными из основной базы
+            pass
 
 
 # функция для получения экземпляра сессии базы данных
-def get_db():
+def get_db() -> Iterator[Session]:
+    # Сессия берет соединение из пула только при первом запросе к БД,
+    # поэтому запросы, отклоненные до обращения к БД (например, с
+    # недействительным токеном), соединение не занимают. После close()
+    # сессию можно использовать снова: соединение будет взято заново.
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def release_db(db: Session) -> None:
+    '''Досрочный возврат соединения в пул, когда обработчик закончил
+    работу с БД и дальше только формирует ответ.
+
+    Загруженные объекты ORM после этого отсоединены от сессии: ответ
+    строится только из уже загруженных атрибутов, а обращение к
+    незагруженным вызывает DetachedInstanceError. Новый запрос через ту же
+    сессию снова возьмет соединение из пула.
+    '''
+    db.close()
@@ -31,4 +31,6 @@ async def client_http_exception_handler(request: Request,
         )
     else:
         error = CodelessErrorResponseModel(message=exception.detail)
-    return JSONResponse(status_code=exception.status_code, content=error.dict())
+    return JSONResponse(status_code=exception.status_code,
+                        content=error.dict(),
+                        headers=getattr(exception, 'headers', None))
@@ -0,0 +1,193 @@
+import logging
+import zlib
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli - необязательная зависимость
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class GzipCompressor:
+    encoding = 'gzip'
+
+    def __init__(self, level: int) -> None:
+        # wbits=31 - формат gzip (заголовок и контрольная сумма)
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        # SYNC_FLUSH отдает клиенту все накопленное после каждого чанка
+        compressed = self._compressor.compress(data)
+        return compressed + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b'') -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class BrotliCompressor:
+    encoding = 'br'
+
+    def __init__(self, level: int) -> None:
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b'') -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def parse_quality(params: List[str]) -> float:
+    for param in params:
+        key, _, value = param.strip().partition('=')
+        if key == 'q':
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    '''Разбор заголовка Accept-Encoding в словарь {кодировка: q}.'''
+    encodings: Dict[str, float] = {}
+    for item in header.split(','):
+        name, *params = item.strip().split(';')
+        if name:
+            encodings[name.strip().lower()] = parse_quality(params)
+    return encodings
+
+
+class CompressionMiddleware:
+    '''Сжатие ответов gzip/brotli по заголовку Accept-Encoding клиента.
+
+    Ответы меньше minimum_size отправляются без сжатия, потоковые
+    (chunked) ответы сжимаются по мере отправки чанков.
+    '''
+
+    def __init__(self,
+                 app: ASGIApp,
+                 minimum_size: int = 1000,
+                 gzip_level: int = 6,
+                 brotli_level: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {'gzip': gzip_level, 'br': brotli_level}
+        if brotli is None:
+            logger.warning('Пакет brotli не установлен: ответы сжимаются '
+                           'только gzip')
+
+    def choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        accepted = parse_accept_encoding(accept_encoding)
+        supported: List[str] = ['br', 'gzip'] if brotli else ['gzip']
+        candidates = [
+            encoding for encoding in supported
+            if accepted.get(encoding, accepted.get('*', 0)) > 0
+        ]
+        if not candidates:
+            return None
+        # При равных q предпочитаем brotli как более эффективный
+        return max(candidates, key=lambda encoding: accepted.get(
+            encoding, accepted.get('*', 0)
+        ))
+
+    async def __call__(self,
+                       scope: Scope,
+                       receive: Receive,
+                       send: Send) -> None:
+        if scope['type'] == 'http':
+            headers = Headers(scope=scope)
+            encoding = self.choose_encoding(
+                headers.get('Accept-Encoding', '')
+            )
+            if encoding:
+                responder = CompressionResponder(
+                    self.app, self.minimum_size,
+                    encoding, self.levels[encoding]
+                )
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class CompressionResponder:
+    def __init__(self,
+                 app: ASGIApp,
+                 minimum_size: int,
+                 encoding: str,
+                 level: int) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoding = encoding
+        self.level = level
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.compressor = None
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(self,
+                       scope: Scope,
+                       receive: Receive,
+                       send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def make_compressor(self):
+        if self.encoding == 'br':
+            return BrotliCompressor(self.level)
+        return GzipCompressor(self.level)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message['type'] == 'http.response.start':
+            # Заголовки отправим, когда станет ясно, сжимаем ли ответ
+            self.initial_message = message
+            headers = Headers(raw=message['headers'])
+            self.passthrough = 'content-encoding' in headers
+        elif message['type'] != 'http.response.body':
+            await self.send(message)
+        elif not self.started:
+            self.started = True
+            await self.start_body(message)
+        elif self.passthrough:
+            await self.send(message)
+        else:
+            await self.send_chunk(message)
+
+    async def start_body(self, message: Message) -> None:
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+        headers = MutableHeaders(raw=self.initial_message['headers'])
+        too_small = len(body) < self.minimum_size and not more_body
+        if self.passthrough or too_small:
+            if not self.passthrough:
+                headers.add_vary_header('Accept-Encoding')
+            self.passthrough = True
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+        self.compressor = self.make_compressor()
+        headers['Content-Encoding'] = self.encoding
+        headers.add_vary_header('Accept-Encoding')
+        if more_body:
+            del headers['Content-Length']
+            message['body'] = self.compressor.compress(body)
+        else:
+            message['body'] = self.compressor.finish(body)
+            headers['Content-Length'] = str(len(message['body']))
+        await self.send(self.initial_message)
+        await self.send(message)
+
+    async def send_chunk(self, message: Message) -> None:
+        body = message.get('body', b'')
+        if message.get('more_body', False):
+            message['body'] = self.compressor.compress(body)
+        else:
+            message['body'] = self.compressor.finish(body)
+        await self.send(message)
@@ -0,0 +1,159 @@
+import asyncio
+import math
+import time
+from typing import Dict, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import metrics
+
+
+OVERLOAD_MESSAGE: str = 'Сервис перегружен. Повторите попытку позже.'
+
+AUTH_PATHS = ('/login', '/refresh', '/logout')
+BULK_PATH_SUFFIXES = ('/batch', '/bulk-update', '/bulk-delete')
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def classify_request(method: str, path: str) -> str:
+    '''Класс маршрута: auth, bulk (массовые операции), read или write'''
+    if path in AUTH_PATHS:
+        return 'auth'
+    if path.endswith(BULK_PATH_SUFFIXES):
+        return 'bulk'
+    if method in READ_METHODS:
+        return 'read'
+    return 'write'
+
+
+class RouteClassLimiter:
+    '''Ограничение числа одновременно обрабатываемых запросов одного
+    класса с ограниченной по длине и времени ожидания очередью.'''
+
+    def __init__(self,
+                 name: str,
+                 limit: int,
+                 queue_size: int,
+                 queue_timeout: float) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self.in_flight = 0
+        # Создается при первом запросе, внутри цикла событий сервера
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> bool:
+        '''Занимает слот; False - если запрос нужно отклонить'''
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.limit)
+        if self._slots.locked() and self.waiting >= self.queue_size:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._slots.release()
+
+
+class ConcurrencyLimitMiddleware:
+    '''Ограничение одновременных запросов по классам маршрутов.
+
+    Запросы сверх лимита ждут в очереди; при переполнении очереди или
+    истечении времени ожидания сразу получают 503 с Retry-After, вместо
+    того чтобы копиться в пуле потоков перед медленной БД. Время в
+    очереди и время обработки учитываются отдельно и передаются в
+    заголовке Server-Timing.
+    '''
+
+    def __init__(self,
+                 app: ASGIApp,
+                 limits: Dict[str, int],
+                 queue_size: int = 50,
+                 queue_timeout: float = 5) -> None:
+        self.app = app
+        self.limiters = {
+            name: RouteClassLimiter(name, limit, queue_size, queue_timeout)
+            for name, limit in limits.items()
+        }
+
+    async def __call__(self,
+                       scope: Scope,
+                       receive: Receive,
+                       send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        limiter = self.limiters.get(
+            classify_request(scope['method'], scope['path'])
+        )
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        queued_at = time.perf_counter()
+        admitted = await limiter.acquire()
+        queue_time = time.perf_counter() - queued_at
+        self.report(limiter, admitted, queue_time)
+        if not admitted:
+            await self.shed(limiter, scope, receive, send)
+            return
+        try:
+            await self.call_app(limiter, queue_time, scope, receive, send)
+        finally:
+            limiter.release()
+            metrics.set(f'limits.{limiter.name}.in_flight', limiter.in_flight)
+
+    async def call_app(self,
+                       limiter: RouteClassLimiter,
+                       queue_time: float,
+                       scope: Scope,
+                       receive: Receive,
+                       send: Send) -> None:
+        started_at = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                app_time = time.perf_counter() - started_at
+                metrics.inc(f'limits.{limiter.name}.handler_seconds', app_time)
+                headers = MutableHeaders(scope=message)
+                headers.append('Server-Timing', (
+                    f'queue;dur={queue_time * 1000:.1f}, '
+                    f'app;dur={app_time * 1000:.1f}'
+                ))
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
+
+    async def shed(self,
+                   limiter: RouteClassLimiter,
+                   scope: Scope,
+                   receive: Receive,
+                   send: Send) -> None:
+        retry_after = max(1, math.ceil(limiter.queue_timeout))
+        response = JSONResponse(
+            status_code=503,
+            content={'message': OVERLOAD_MESSAGE},
+            headers={'Retry-After': str(retry_after)}
+        )
+        await response(scope, receive, send)
+
+    @staticmethod
+    def report(limiter: RouteClassLimiter,
+               admitted: bool,
+               queue_time: float) -> None:
+        prefix = f'limits.{limiter.name}'
+        metrics.inc(f'{prefix}.admitted' if admitted else f'{prefix}.shed')
+        metrics.inc(f'{prefix}.queue_seconds', queue_time)
+        metrics.set(f'{prefix}.in_flight', limiter.in_flight)
+        metrics.set(f'{prefix}.waiting', limiter.waiting)
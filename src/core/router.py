@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.orm import Session
+
+import core.database as db
+from core.database import release_db
+import core.handlers.exceptions as exc
+from core.metrics import metrics
+from auth.manager import AuthJWT, check_jwt_user
+from users.models import UserRole
+
+
+router = APIRouter(
+    prefix='/private',
+    tags=['admin'],
+)
+
+
+@router.get(path='/metrics',
+            summary='Счетчики для мониторинга',
+            description=('Здесь администратор может увидеть '
+                         'текущие значения счетчиков сервиса'),
+            status_code=status.HTTP_200_OK,
+            responses={401: {"model": exc.CodelessErrorResponseModel},
+                       403: {"model": exc.CodelessErrorResponseModel}})
+def service_metrics(Authorize: AuthJWT = Depends(),
+                    db: Session = Depends(db.get_db)):
+    _ = check_jwt_user(Authorize, db, (UserRole.superuser))
+    release_db(db)
+    return metrics.snapshot()
@@ -0,0 +1,70 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from core.metrics import metrics
+
+
+def copy_error(error: BaseException) -> BaseException:
+    '''Копия исключения без traceback; __init__ не вызывается, так как
+    его аргументы могут не совпадать с error.args'''
+    copied = type(error).__new__(type(error), *error.args)
+    copied.__dict__.update(error.__dict__)
+    return copied
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    '''Объединение одновременных одинаковых вызовов.
+
+    Пока вызов с ключом key выполняется, остальные вызовы с тем же ключом
+    не выполняют функцию повторно, а ждут и получают тот же результат
+    (или копию того же исключения). Ключ должен включать все, от чего зависит
+    результат, в том числе область доступа вызывающего.
+
+    Ожидание ограничено wait_timeout секундами: если первый вызов завис,
+    ожидающий вызов выполняет функцию сам, а не держит поток бесконечно.
+    '''
+
+    def __init__(self, name: str, wait_timeout: float) -> None:
+        self.name = name
+        self.wait_timeout = wait_timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+        if not is_leader:
+            return self._wait(call, fn)
+        metrics.inc(f'{self.name}.executed')
+        try:
+            call.result = fn()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _wait(self, call: _Call, fn: Callable[[], Any]) -> Any:
+        metrics.inc(f'{self.name}.coalesced')
+        if not call.done.wait(self.wait_timeout):
+            metrics.inc(f'{self.name}.timeouts')
+            return fn()
+        if call.error is not None:
+            # Каждый ожидающий поднимает свою копию исключения: traceback
+            # общего объекта дописывался бы одновременно из разных потоков.
+            # Исключение первого вызова доступно как __cause__
+            raise copy_error(call.error) from call.error
+        return call.result
@@ -2,9 +2,25 @@ from fastapi import FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
+from core.config import (
+    COMPRESSION_MINIMUM_SIZE,
+    GZIP_COMPRESSION_LEVEL,
+    BROTLI_COMPRESSION_LEVEL,
+    AUTH_CONCURRENCY_LIMIT,
+    READ_CONCURRENCY_LIMIT,
+    WRITE_CONCURRENCY_LIMIT,
+    BULK_CONCURRENCY_LIMIT,
+    CONCURRENCY_QUEUE_SIZE,
+    CONCURRENCY_QUEUE_TIMEOUT,
+)
+from core.database import USERS_SHARDED, replicate_table
+from core.middlewares.compression import CompressionMiddleware
+from core.middlewares.limits import ConcurrencyLimitMiddleware
 from core.handlers.exceptions import \
     internal_exception_handler, client_http_exception_handler
 from auth.router import router as router_auth
+from core.router import router as router_monitoring
+from users.models import City
 from users.router import router_users, router_admin
 
 
@@ -13,6 +29,19 @@ app = FastAPI(
     version='0.1.0',
 )
 
+# Добавлен первым, чтобы быть ближе всех к обработчикам:
+# отклоненные запросы тоже получают заголовки CORS
+app.add_middleware(
+    ConcurrencyLimitMiddleware,
+    limits={
+        'auth': AUTH_CONCURRENCY_LIMIT,
+        'read': READ_CONCURRENCY_LIMIT,
+        'write': WRITE_CONCURRENCY_LIMIT,
+        'bulk': BULK_CONCURRENCY_LIMIT,
+    },
+    queue_size=CONCURRENCY_QUEUE_SIZE,
+    queue_timeout=CONCURRENCY_QUEUE_TIMEOUT,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -20,6 +49,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MINIMUM_SIZE,
+    gzip_level=GZIP_COMPRESSION_LEVEL,
+    brotli_level=BROTLI_COMPRESSION_LEVEL,
+)
 
 app.add_exception_handler(
     status.HTTP_500_INTERNAL_SERVER_ERROR, internal_exception_handler
@@ -29,6 +64,17 @@ app.add_exception_handler(HTTPException, client_http_exception_handler)
 app.include_router(router_auth)
 app.include_router(router_users)
 app.include_router(router_admin)
+app.include_router(router_monitoring)
+
+
+@app.on_event('startup')
+def replicate_cities() -> None:
+    # Города заполняются в основной базе; при шардировании их копия нужна
+    # в каждом шарде для подсказок и внешнего ключа users.city_id.
+    # Позже город копируется при записи пользователя с ним, а изменения
+    # справочника переносятся командой python -m users.replicate
+    if USERS_SHARDED:
+        replicate_table(City.__table__)
 
 
 if __name__ == "__main__":
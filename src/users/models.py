@@ -2,12 +2,27 @@ import re
 from datetime import date
 from enum import Enum
 
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Text
+from sqlalchemy import (
+    Column,
+    Connection,
+    Integer,
+    String,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    PrimaryKeyConstraint,
+    Table,
+    Text,
+    event,
+    func,
+    insert,
+)
 from sqlalchemy.orm import relationship, validates
 from passlib import hash as _hash
 import phonenumbers
 
-from core.database import Base
+from core.database import SHARD_KEY, Base
 
 
 class UserRole(str, Enum):
@@ -15,6 +30,15 @@ class UserRole(str, Enum):
     superuser = "Admin"
 
 
+def verify_password(password: str, hashed_password: str) -> bool:
+    return _hash.bcrypt.verify(password, hashed_password)
+
+
+def make_birthday_key(birthday: date) -> int:
+    '''Ключ дня рождения без года: месяц * 100 + день (29 февраля - 229)'''
+    return birthday.month * 100 + birthday.day
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -23,20 +47,34 @@ class User(Base):
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     other_name = Column(String)
-    email = Column(String, nullable=False, unique=True, index=True)
+    # Хранится в нижнем регистре, уникальность - по индексу на lower(email)
+    email = Column(String, nullable=False)
     phone = Column(String)
     birthday = Column(Date)
+    # Ключ дня рождения без года для поиска ближайших дней рождения
+    birthday_key = Column(Integer)
     city_id = Column(Integer, ForeignKey("cities.id"))
     additional_info = Column(Text)
     role = Column(String, nullable=False, default=UserRole.basic)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    # Порядковый номер последнего изменения для ленты изменений
+    change_seq = Column(Integer, nullable=False, default=0, server_default='0')
 
     city = relationship("City")
 
+    __table_args__ = (
+        Index('ix_users_change_seq', 'change_seq', 'id'),
+        Index('ix_users_email_lower', func.lower(email), unique=True),
+        Index('ix_users_birthday_key', 'birthday_key', 'id'),
+        {'info': {SHARD_KEY: 'id'}},
+    )
+
     @validates('email')
     def validate_email(self, key, email):
         if not re.match(r"[^@]+@[^@]+\.[^@]+", email):
             raise ValueError('Неверный email адрес')
-        return email
+        return email.lower()
 
     @validates('phone')
     def validate_phone(self, key, phone):
@@ -53,14 +91,16 @@ class User(Base):
     @validates('birthday')
     def validate_birthday(self, key, birthday):
         if birthday is None:
+            self.birthday_key = None
             return birthday
         today = date.today()
         if birthday > today:
             raise ValueError('День рождения не может быть в будущем')
+        self.birthday_key = make_birthday_key(birthday)
         return birthday
 
     def verify_password(self, password: str) -> bool:
-        return _hash.bcrypt.verify(password, self.hashed_password)
+        return verify_password(password, self.hashed_password)
 
     def is_superuser(self) -> bool:
         return self.role == UserRole.superuser
@@ -79,3 +119,88 @@ class City(Base):
 
     def __repr__(self) -> str:
         return f'City {self.id}: {self.name}'
+
+
+class UserChangeCounter(Base):
+    '''Счетчик номеров изменений для ленты изменений (одна строка).
+
+    Номер выделяется через UPDATE в транзакции изменения, и блокировка
+    строки держится до фиксации: следующая транзакция получит номер только
+    после фиксации или отката предыдущей, поэтому номера становятся видны
+    читателям строго по возрастанию.'''
+    __tablename__ = "user_change_counter"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+@event.listens_for(UserChangeCounter.__table__, 'after_create')
+def seed_user_change_counter(target: Table, connection: Connection,
+                             **kw) -> None:
+    '''Строка счетчика для баз, созданных через create_all
+    (в существующих базах ее создает миграция)'''
+    connection.execute(insert(target).values(id=1, value=0))
+
+
+class UserStatDimension(str, Enum):
+    city = "city"
+    role = "role"
+    birthday_month = "birthday_month"
+
+
+class UserStat(Base):
+    '''Число пользователей с данным значением признака (город, роль,
+    месяц рождения); пустой ключ - значение не указано.'''
+    __tablename__ = "user_stats"
+
+    dimension = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('dimension', 'key'),
+    )
+
+    def __repr__(self) -> str:
+        return f'UserStat {self.dimension}={self.key}: {self.count}'
+
+
+class UserIdSequence(Base):
+    '''Глобальный генератор ID пользователей при шардировании: ID
+    выделяется в основной базе до записи пользователя в его шард.'''
+    __tablename__ = "user_id_sequence"
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+
+class UserLogin(Base):
+    '''Справочник логинов при шардировании: строки распределяются по
+    хешу логина, поэтому вход находит ID пользователя без опроса всех
+    шардов.'''
+    __tablename__ = "user_logins"
+    __table_args__ = {'info': {SHARD_KEY: 'login'}}
+
+    login = Column(String, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+
+    def __repr__(self) -> str:
+        return f'UserLogin {self.login}: {self.user_id}'
+
+
+class UserTombstone(Base):
+    '''Отметка об удалении пользователя для ленты изменений.'''
+    __tablename__ = "user_tombstones"
+
+    change_seq = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, nullable=False)
+
+    # Отметки хранятся в шарде удаленного пользователя
+    __table_args__ = (
+        PrimaryKeyConstraint('change_seq', 'user_id'),
+        {'info': {SHARD_KEY: 'user_id'}},
+    )
+
+    def __repr__(self) -> str:
+        return f'UserTombstone {self.change_seq}: {self.user_id}'
@@ -0,0 +1,15 @@
+'''Копирование справочника городов из основной базы во все шарды.
+
+Города копируются в шарды при запуске приложения и при записи
+пользователя с городом. После добавления или переименования городов
+в основной базе запустите из каталога src:
+
+    python -m users.replicate
+'''
+from core.database import USERS_SHARDED, replicate_table
+from users.models import City
+
+
+if __name__ == '__main__':
+    if USERS_SHARDED:
+        replicate_table(City.__table__)
@@ -0,0 +1,99 @@
+'''Запросы на горячих путях (проверка JWT, вход, поиск города).
+
+Выражения select() строятся один раз при импорте модуля с параметрами
+bindparam, поэтому при каждом вызове не создается новый Query, а
+скомпилированный SQL берется из кеша запросов движка. Для проверок
+доступа и входа вместо объектов ORM возвращаются легкие строки-проекции
+только с нужными столбцами.
+
+При шардировании запросы по ID уходят только в шард пользователя, а вход
+сначала находит ID в справочнике логинов, распределенном по хешу email,
+и затем сверяет email найденного пользователя с логином.
+'''
+
+from typing import Dict, List, Optional
+
+from sqlalchemy import Row, bindparam, func, select
+from sqlalchemy.orm import InstrumentedAttribute, Session, load_only
+
+from core.database import USERS_SHARDED
+from .models import User, City, UserLogin
+
+
+# Столбцы таблицы пользователей, из которых берутся поля моделей ответа
+USER_FIELDS_COLUMNS: Dict[str, InstrumentedAttribute] = {
+    'id': User.id,
+    'first_name': User.first_name,
+    'last_name': User.last_name,
+    'other_name': User.other_name,
+    'email': User.email,
+    'phone': User.phone,
+    'birthday': User.birthday,
+    'city': User.city_id,
+    'additional_info': User.additional_info,
+    'is_admin': User.role,
+}
+
+# Столбцы проекции текущего пользователя: все, что нужно для проверки
+# прав и ответа о текущем пользователе, без крупных и служебных полей
+AUTH_USER_COLUMNS: List[InstrumentedAttribute] = [
+    User.id,
+    User.role,
+    User.first_name,
+    User.last_name,
+    User.other_name,
+    User.email,
+    User.phone,
+    User.birthday,
+]
+
+user_by_id_statement = select(User).where(User.id == bindparam('id'))
+auth_user_by_id_statement = select(*AUTH_USER_COLUMNS) \
+    .where(User.id == bindparam('id'))
+# Логин сравнивается без учета регистра по индексу ix_users_email_lower
+user_by_login_statement = select(*AUTH_USER_COLUMNS, User.hashed_password) \
+    .where(func.lower(User.email) == bindparam('login'))
+user_id_by_login_statement = select(UserLogin.user_id) \
+    .where(UserLogin.login == bindparam('login'))
+login_user_by_id_statement = select(*AUTH_USER_COLUMNS, User.hashed_password) \
+    .where(User.id == bindparam('id'))
+city_by_id_statement = select(City.id, City.name) \
+    .where(City.id == bindparam('id'))
+
+
+def get_user_by_id(id: int,
+                   db: Session,
+                   fields: Optional[List[str]] = None) -> Optional[User]:
+    '''Объект пользователя по ID (для изменения или детального ответа)'''
+    if not fields:
+        return db.scalar(user_by_id_statement, {'id': id})
+    # Загружаем из БД только столбцы запрошенных полей
+    columns = [USER_FIELDS_COLUMNS[field] for field in fields]
+    return db.scalar(
+        select(User).options(load_only(*columns)).where(User.id == id)
+    )
+
+
+def get_auth_user(id: int, db: Session) -> Optional[Row]:
+    '''Проекция пользователя по ID для проверки JWT'''
+    return db.execute(auth_user_by_id_statement, {'id': id}).first()
+
+
+def get_user_by_login(login: str, db: Session) -> Optional[Row]:
+    '''Проекция пользователя по логину с хешем пароля для входа'''
+    login = login.lower()
+    if not USERS_SHARDED:
+        return db.execute(user_by_login_statement, {'login': login}).first()
+    user_id = db.scalar(user_id_by_login_statement, {'login': login})
+    if user_id is None:
+        return None
+    db_user = db.execute(login_user_by_id_statement, {'id': user_id}).first()
+    # Справочник и пользователь фиксируются в разных шардах: запись,
+    # оставшаяся после сбоя между фиксациями, логину не соответствует
+    if db_user is None or db_user.email.lower() != login:
+        return None
+    return db_user
+
+
+def get_city_by_id(id: int, db: Session) -> Optional[Row]:
+    return db.execute(city_by_id_statement, {'id': id}).first()
@@ -1,12 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from datetime import date
+from typing import Any, Callable, Hashable, List, Optional, Type
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from passlib import hash as _hash
 
 import core.database as db
+from core.database import release_db
 import core.handlers.exceptions as exc
+from core.config import (
+    SINGLEFLIGHT_WAIT_TIMEOUT,
+    USERS_PAGES_CACHE_MAX_PAGE,
+)
+from core.singleflight import SingleFlight
 from auth.manager import AuthJWT, check_jwt_user
 from .models import User, UserRole
-from . import schemas, utils
+from . import repository, schemas, stats, utils
 
 
 router_users = APIRouter(
@@ -14,6 +26,100 @@ router_users = APIRouter(
     tags=['user'],
 )
 
+FIELDS_DESCRIPTION = ('Список возвращаемых полей через запятую, '
+                      'например: id,email')
+AFTER_DESCRIPTION = ('Курсор: страница начинается после пользователя с '
+                     'этим ID, номер страницы при этом не учитывается. '
+                     'Для следующей страницы передайте next_cursor')
+BULK_DESCRIPTION = ('Пользователи изменяются пачками, и каждая пачка '
+                    'фиксируется отдельно, поэтому операция не атомарна: '
+                    'при ошибке уже обработанные пачки остаются в силе, '
+                    'а ответ 500 содержит их число в affected, '
+                    'completed=false и причину в error: constraint, '
+                    'connection или database')
+
+
+def get_requested_fields(fields: Optional[str],
+                         model: Type[BaseModel]) -> Optional[List[str]]:
+    try:
+        return utils.parse_fields(fields, model)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Неверный список полей. Допустимые поля: {}'.format(
+                ', '.join(model.__fields__)))
+
+
+def check_login_available(login: Optional[str],
+                          db: Session,
+                          user_id: Optional[int] = None) -> None:
+    '''Проверка, что логин без учета регистра не занят другим пользователем'''
+    if login is None:
+        return
+    db_user = repository.get_user_by_login(login, db)
+    if db_user and db_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=('Пользователь с таким логином уже существует. '
+                    'Придумайте другой и попробуйте снова.'))
+
+
+# Одновременные одинаковые запросы на чтение выполняют один запрос к БД
+coalesced_reads = SingleFlight('users.reads', SINGLEFLIGHT_WAIT_TIMEOUT)
+
+
+def render_json(content: Any) -> bytes:
+    '''Сериализация ответа (модели или словаря с запрошенными полями)'''
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+
+def make_read_key(route: str,
+                  role: UserRole,
+                  requested_fields: Optional[List[str]],
+                  *params: Hashable) -> Hashable:
+    '''Ключ общего ответа на чтение. Готовое тело ответа отдается в обход
+    проверки response_model, поэтому ключ включает все, от чего зависит
+    состав ответа: маршрут, роль запрашивающего и разобранный список
+    запрошенных полей.'''
+    fields = tuple(requested_fields) if requested_fields else None
+    return (route, role, fields) + params
+
+
+def coalesce_read(key: Hashable,
+                  render: Callable[[], bytes],
+                  db: Session) -> Response:
+    '''Ответ на чтение, общий для одновременных запросов с ключом key
+    из make_read_key, поэтому результат никогда не передается запросу
+    с другой областью доступа или другим набором полей.'''
+    # Ожидающие запросы не должны держать соединение с БД
+    release_db(db)
+    body = coalesced_reads.do(key, render)
+    return Response(content=body, media_type='application/json')
+
+
+def cached_page_read(key: Hashable,
+                     page: int,
+                     after: Optional[int],
+                     render: Callable[[], bytes],
+                     db: Session) -> Response:
+    '''Ответ со страницей списка из кеша, а при промахе - через
+    объединение одинаковых запросов с сохранением результата в кеш.
+    Страницы по курсору не кешируются: их ключи почти не повторяются.'''
+    if after is not None or page > USERS_PAGES_CACHE_MAX_PAGE:
+        return coalesce_read(key, render, db)
+    body = utils.users_pages_cache.get(key)
+    if body is not None:
+        release_db(db)
+        return Response(content=body, media_type='application/json')
+
+    def render_and_cache() -> bytes:
+        generation = utils.users_pages_cache.generation
+        body = render()
+        utils.users_pages_cache.set(key, body, generation)
+        return body
+
+    return coalesce_read(key, render_and_cache, db)
+
 
 @router_users.get(path='/current',
                   summary='Получение данных о текущем пользователе',
@@ -30,6 +136,7 @@ def current_user(Authorize: AuthJWT = Depends(),
     auth_user = check_jwt_user(
         Authorize, db, (UserRole.basic, UserRole.superuser)
     )
+    release_db(db)
     # Формирование модели ответа
     response = schemas.CurrentUserResponseModel(
         first_name=auth_user.first_name,
@@ -38,7 +145,7 @@ def current_user(Authorize: AuthJWT = Depends(),
         email=auth_user.email,
         phone=auth_user.phone,
         birthday=auth_user.birthday,
-        is_admin=auth_user.is_superuser()
+        is_admin=auth_user.role == UserRole.superuser
     )
     return response
 
@@ -51,30 +158,35 @@ def current_user(Authorize: AuthJWT = Depends(),
                     response_model=schemas.UpdateUserResponseModel,
                     responses={400: {"model": exc.ErrorResponseModel},
                                401: {"model": exc.CodelessErrorResponseModel},
-                               404: {"model": exc.CodelessErrorResponseModel}})
+                               404: {"model": exc.CodelessErrorResponseModel},
+                               409: {"model": exc.CodelessErrorResponseModel}})
 def edit_user(update_user_data: schemas.UpdateUserModel,
               Authorize: AuthJWT = Depends(),
               db: Session = Depends(db.get_db)):
     auth_user = check_jwt_user(
         Authorize, db, (UserRole.basic, UserRole.superuser)
     )
+    check_login_available(update_user_data.email, db, auth_user.id)
+    # Для изменения нужен объект ORM, а не проекция из проверки JWT
+    db_user = repository.get_user_by_id(auth_user.id, db)
     # Обновляем поля пользователя в соответствии с данными запроса
-    auth_user: User = utils.update_db_model_instance_fields(
-        model_instance=auth_user,
+    db_user: User = utils.update_db_model_instance_fields(
+        model_instance=db_user,
         update_instance_data=update_user_data
     )
     # Формирование модели ответа
     response = schemas.UpdateUserResponseModel(
-        id=auth_user.id,
-        first_name=auth_user.first_name,
-        last_name=auth_user.last_name,
-        other_name=auth_user.other_name,
-        email=auth_user.email,
-        phone=auth_user.phone,
-        birthday=auth_user.birthday
+        id=db_user.id,
+        first_name=db_user.first_name,
+        last_name=db_user.last_name,
+        other_name=db_user.other_name,
+        email=db_user.email,
+        phone=db_user.phone,
+        birthday=db_user.birthday
     )
     # Сохраняем изменения в базе данных
-    utils.update_in_db(auth_user, db)
+    utils.update_in_db(db_user, db)
+    release_db(db)
     return response
 
 
@@ -88,20 +200,46 @@ def edit_user(update_user_data: schemas.UpdateUserModel,
                   responses={400: {"model": exc.ErrorResponseModel},
                              401: {"model": exc.CodelessErrorResponseModel}})
 def users(page: int, size: int,
+          fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+          after: Optional[int] = Query(None, description=AFTER_DESCRIPTION),
           Authorize: AuthJWT = Depends(),
           db: Session = Depends(db.get_db)):
-    _ = check_jwt_user(Authorize, db, (UserRole.basic, UserRole.superuser))
-    total = db.query(User).count()
-    users, _ = utils.get_users_list_with_cities_hint(page, size, db)
+    auth_user = check_jwt_user(
+        Authorize, db, (UserRole.basic, UserRole.superuser)
+    )
+    requested_fields = get_requested_fields(
+        fields, schemas.UsersListElementModel
+    )
+    key = make_read_key('users', auth_user.role, requested_fields,
+                        page, size, after)
+    return cached_page_read(
+        key, page, after,
+        lambda: render_users_page(page, size, after, requested_fields, db),
+        db
+    )
+
+
+def render_users_page(page: int,
+                      size: int,
+                      after: Optional[int],
+                      requested_fields: Optional[List[str]],
+                      db: Session) -> bytes:
+    total = utils.count_users([], db)
+    users, _, next_cursor = utils.get_users_list_with_cities_hint(
+        page, size, db, requested_fields, after
+    )
+    release_db(db)
     # Создаем метаданные для пагинации
     meta = schemas.UsersListMetaDataModel(
         pagination=schemas.PaginatedMetaDataModel(
-            total=total, page=page, size=size
+            total=total, page=page, size=size, next_cursor=next_cursor
         )
     )
+    if requested_fields:
+        return render_json({'data': users, 'meta': meta})
     # Формирование модели ответа
     response = schemas.UsersListResponseModel(data=users, meta=meta)
-    return response
+    return render_json(response)
 
 
 router_admin = APIRouter(
@@ -121,21 +259,51 @@ router_admin = APIRouter(
                              401: {"model": exc.CodelessErrorResponseModel},
                              403: {"model": exc.CodelessErrorResponseModel}})
 def private_users(page: int, size: int,
+                  fields: Optional[str] = Query(
+                      None, description=FIELDS_DESCRIPTION
+                  ),
+                  after: Optional[int] = Query(
+                      None, description=AFTER_DESCRIPTION
+                  ),
                   Authorize: AuthJWT = Depends(),
                   db: Session = Depends(db.get_db)):
-    _ = check_jwt_user(Authorize, db, (UserRole.superuser))
-    total = db.query(User).count()
-    users, cities_hint = utils.get_users_list_with_cities_hint(page, size, db)
+    auth_user = check_jwt_user(Authorize, db, (UserRole.superuser))
+    requested_fields = get_requested_fields(
+        fields, schemas.UsersListElementModel
+    )
+    key = make_read_key('private_users', auth_user.role, requested_fields,
+                        page, size, after)
+    return cached_page_read(
+        key, page, after,
+        lambda: render_private_users_page(
+            page, size, after, requested_fields, db
+        ),
+        db
+    )
+
+
+def render_private_users_page(page: int,
+                              size: int,
+                              after: Optional[int],
+                              requested_fields: Optional[List[str]],
+                              db: Session) -> bytes:
+    total = utils.count_users([], db)
+    users, cities_hint, next_cursor = utils.get_users_list_with_cities_hint(
+        page, size, db, requested_fields, after
+    )
+    release_db(db)
     # Создаем метаданные для пагинации
     meta = schemas.PrivateUsersListMetaDataModel(
         pagination=schemas.PaginatedMetaDataModel(
-            total=total, page=page, size=size
+            total=total, page=page, size=size, next_cursor=next_cursor
         ),
         hint=schemas.PrivateUsersListHintMetaModel(city=cities_hint)
     )
+    if requested_fields:
+        return render_json({'data': users, 'meta': meta})
     # Формирование модели ответа
     response = schemas.PrivateUsersListResponseModel(data=users, meta=meta)
-    return response
+    return render_json(response)
 
 
 @router_admin.post(path='/users',
@@ -153,20 +321,16 @@ def private_create_users(create_user_data: schemas.PrivateCreateUserModel,
                          db: Session = Depends(db.get_db)):
     _ = check_jwt_user(Authorize, db, (UserRole.superuser))
     # Проверяем, есть ли пользователь с введенным логином в базе данных
-    db_user = utils.get_user_by_login(create_user_data.email, db)
-    if db_user:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=('Пользователь с таким логином уже существует. '
-                    'Придумайте другой и попробуйте снова.'))
+    check_login_available(create_user_data.email, db)
     user_role = UserRole.superuser if create_user_data.is_admin else UserRole.basic  # noqa: E501
     # Проверяем, есть ли город с введенным ID в базе данных
-    user_home_city = utils.get_city_by_id(create_user_data.city, db)
+    user_home_city = repository.get_city_by_id(create_user_data.city, db)
     if create_user_data.city and not user_home_city:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=('Города с таким ID нет в базе данных.'))
     city_id = user_home_city.id if user_home_city else None
+    utils.replicate_city(city_id)
     # Создаем нового пользователя и добавляем его в базу данных
     hashed_user_password = _hash.bcrypt.hash(create_user_data.password)
     db_user = User(first_name=create_user_data.first_name,
@@ -179,21 +343,228 @@ def private_create_users(create_user_data: schemas.PrivateCreateUserModel,
                    additional_info=create_user_data.additional_info,
                    role=user_role,
                    hashed_password=hashed_user_password)
-    # Формирование модели ответа
-    response = schemas.PrivateDetailUserResponseModel(
-        id=db_user.id,
-        first_name=db_user.first_name,
-        last_name=db_user.last_name,
-        other_name=db_user.other_name,
-        email=db_user.email,
-        phone=db_user.phone,
-        birthday=db_user.birthday,
-        city=db_user.city_id,
-        additional_info=db_user.additional_info,
-        is_admin=db_user.is_superuser(),
-    )
     # Добавляем изменения в базе данных
     utils.add_in_db(db_user, db)
+    release_db(db)
+    # Формирование модели ответа (ID известен только после сохранения)
+    response = utils.make_private_detail_user_model(db_user)
+    return response
+
+
+@router_admin.post(path='/users/batch',
+                   summary='Пакетное получение информации о пользователях',
+                   description=('Здесь администратор может получить '
+                                'детальную информацию о нескольких '
+                                'пользователях по списку ID одним запросом'),
+                   status_code=status.HTTP_200_OK,
+                   response_model=schemas.PrivateUsersBatchResponseModel,
+                   responses={400: {"model": exc.ErrorResponseModel},
+                              401: {"model": exc.CodelessErrorResponseModel},
+                              403: {"model": exc.CodelessErrorResponseModel}})
+def private_get_users_batch(batch_data: schemas.PrivateUsersBatchModel,
+                            Authorize: AuthJWT = Depends(),
+                            db: Session = Depends(db.get_db)):
+    _ = check_jwt_user(Authorize, db, (UserRole.superuser))
+    # Убираем повторы, сохраняя порядок запрошенных ID
+    ids = list(dict.fromkeys(batch_data.ids))
+    db_users = {user.id: user for user in utils.get_users_by_ids(ids, db)}
+    release_db(db)
+    # Формирование модели ответа в порядке запрошенных ID
+    response = schemas.PrivateUsersBatchResponseModel(
+        data=[utils.make_private_detail_user_model(db_users[pk])
+              for pk in ids if pk in db_users],
+        not_found=[pk for pk in ids if pk not in db_users]
+    )
+    return response
+
+
+def make_bulk_response(affected: int,
+                       error: Optional[schemas.BulkFailureReason],
+                       dry_run: bool) -> Any:
+    '''Ответ массовой операции; прерванная ошибкой операция отдается с
+    кодом 500, числом уже измененных пользователей и причиной ошибки'''
+    response = schemas.PrivateUsersBulkResponseModel(
+        affected=affected, dry_run=dry_run,
+        completed=error is None, error=error
+    )
+    if error is None:
+        return response
+    return JSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content=jsonable_encoder(response)
+    )
+
+
+@router_admin.post(path='/users/bulk-update',
+                   summary='Массовое изменение пользователей',
+                   description=('Здесь администратор может изменить город, '
+                                'роль или дополнительную информацию всех '
+                                'пользователей, подходящих под условия. '
+                                'В режиме dry_run возвращается только число '
+                                'затрагиваемых пользователей. '
+                                f'{BULK_DESCRIPTION}'),
+                   status_code=status.HTTP_200_OK,
+                   response_model=schemas.PrivateUsersBulkResponseModel,
+                   responses={400: {"model": exc.ErrorResponseModel},
+                              401: {"model": exc.CodelessErrorResponseModel},
+                              403: {"model": exc.CodelessErrorResponseModel},
+                              409: {"model": exc.CodelessErrorResponseModel},
+                              500: {"model":
+                                    schemas.PrivateUsersBulkResponseModel}})
+def private_bulk_update_users(
+    bulk_data: schemas.PrivateUsersBulkUpdateModel,
+    Authorize: AuthJWT = Depends(),
+    db: Session = Depends(db.get_db)
+):
+    _ = check_jwt_user(Authorize, db, (UserRole.superuser))
+    # Проверяем, есть ли город с введенным ID в базе данных
+    city_id = bulk_data.values.city
+    if city_id is not None and not repository.get_city_by_id(city_id, db):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=('Города с таким ID нет в базе данных.'))
+    utils.replicate_city(city_id)
+    conditions = utils.make_users_filter_conditions(bulk_data.filter)
+    if bulk_data.dry_run:
+        affected, error = utils.count_users(conditions, db), None
+    else:
+        values = utils.make_users_bulk_values(bulk_data.values)
+        affected, error = utils.bulk_update_in_db(conditions, values, db)
+    release_db(db)
+    return make_bulk_response(affected, error, bulk_data.dry_run)
+
+
+@router_admin.post(path='/users/bulk-delete',
+                   summary='Массовое удаление пользователей',
+                   description=('Здесь администратор может удалить всех '
+                                'пользователей, подходящих под условия. '
+                                'В режиме dry_run возвращается только число '
+                                'затрагиваемых пользователей. '
+                                f'{BULK_DESCRIPTION}'),
+                   status_code=status.HTTP_200_OK,
+                   response_model=schemas.PrivateUsersBulkResponseModel,
+                   responses={400: {"model": exc.ErrorResponseModel},
+                              401: {"model": exc.CodelessErrorResponseModel},
+                              403: {"model": exc.CodelessErrorResponseModel},
+                              500: {"model":
+                                    schemas.PrivateUsersBulkResponseModel}})
+def private_bulk_delete_users(
+    bulk_data: schemas.PrivateUsersBulkDeleteModel,
+    Authorize: AuthJWT = Depends(),
+    db: Session = Depends(db.get_db)
+):
+    _ = check_jwt_user(Authorize, db, (UserRole.superuser))
+    conditions = utils.make_users_filter_conditions(bulk_data.filter)
+    if bulk_data.dry_run:
+        affected, error = utils.count_users(conditions, db), None
+    else:
+        affected, error = utils.bulk_delete_in_db(conditions, db)
+    release_db(db)
+    return make_bulk_response(affected, error, bulk_data.dry_run)
+
+
+@router_admin.get(path='/users/changes',
+                  summary='Лента изменений пользователей',
+                  description=('Здесь находятся созданные, измененные и '
+                               'удаленные пользователи после курсора в '
+                               'порядке изменений. Для продолжения '
+                               'синхронизации передайте next_cursor. '
+                               'При шардировании номера изменений '
+                               'ведутся в каждом шарде отдельно, а '
+                               'курсор содержит позиции всех шардов. '
+                               'Пользователи, созданные до появления '
+                               'ленты, до первого изменения отдаются '
+                               'с операцией created'),
+                  status_code=status.HTTP_200_OK,
+                  response_model=schemas.UsersChangesResponseModel,
+                  responses={400: {"model": exc.ErrorResponseModel},
+                             401: {"model": exc.CodelessErrorResponseModel},
+                             403: {"model": exc.CodelessErrorResponseModel}})
+def private_users_changes(since: str = '0.0',
+                          size: int = Query(100, ge=1, le=1000),
+                          Authorize: AuthJWT = Depends(),
+                          db: Session = Depends(db.get_db)):
+    _ = check_jwt_user(Authorize, db, (UserRole.superuser))
+    try:
+        positions = utils.decode_changes_cursor(since)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Неверный курсор ленты изменений.')
+    changes = utils.get_users_changes(positions, size, db)
+    release_db(db)
+    next_positions = utils.advance_changes_cursor(positions, changes)
+    # Формирование модели ответа
+    response = schemas.UsersChangesResponseModel(
+        data=[utils.make_user_change_model(change) for change in changes],
+        next_cursor=utils.encode_changes_cursor(next_positions)
+    )
+    return response
+
+
+@router_admin.get(path='/users/stats',
+                  summary='Статистика пользователей',
+                  description=('Здесь находится число пользователей по '
+                               'городам, ролям и месяцам рождения. Счетчики '
+                               'обновляются при каждом изменении '
+                               'пользователей'),
+                  status_code=status.HTTP_200_OK,
+                  response_model=schemas.UsersStatsResponseModel,
+                  responses={401: {"model": exc.CodelessErrorResponseModel},
+                             403: {"model": exc.CodelessErrorResponseModel}})
+def private_users_stats(Authorize: AuthJWT = Depends(),
+                        db: Session = Depends(db.get_db)):
+    _ = check_jwt_user(Authorize, db, (UserRole.superuser))
+    users_stats = stats.get_users_stats(db)
+    release_db(db)
+    # Формирование модели ответа
+    response = stats.make_users_stats_model(users_stats)
+    return response
+
+
+@router_admin.get(path='/users/birthdays',
+                  summary='Ближайшие дни рождения',
+                  description=('Здесь находятся пользователи, у которых '
+                               'день рождения в ближайшие days дней, '
+                               'начиная с сегодняшнего, в порядке '
+                               'наступления. Для следующей страницы '
+                               'передайте next_cursor; курсор действует '
+                               'только в день его получения'),
+                  status_code=status.HTTP_200_OK,
+                  response_model=schemas.UsersBirthdaysResponseModel,
+                  responses={400: {"model": exc.ErrorResponseModel},
+                             401: {"model": exc.CodelessErrorResponseModel},
+                             403: {"model": exc.CodelessErrorResponseModel}})
+def private_users_birthdays(days: int = Query(7, ge=1, le=365),
+                            size: int = Query(100, ge=1, le=1000),
+                            cursor: Optional[str] = None,
+                            Authorize: AuthJWT = Depends(),
+                            db: Session = Depends(db.get_db)):
+    _ = check_jwt_user(Authorize, db, (UserRole.superuser))
+    today = date.today()
+    ranges = utils.get_birthdays_ranges(today, days)
+    try:
+        position = None if cursor is None \
+            else utils.decode_birthdays_cursor(cursor, ranges)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=('Неверный или устаревший курсор списка дней рождения. '
+                    'Запросите список с первой страницы.'))
+    db_users = utils.get_upcoming_birthdays(ranges, position, size, db)
+    release_db(db)
+    next_cursor = None
+    if len(db_users) == size:
+        last_user = db_users[-1]
+        next_cursor = utils.encode_cursor(
+            (last_user.birthday_key, last_user.id)
+        )
+    # Формирование модели ответа
+    response = schemas.UsersBirthdaysResponseModel(
+        data=[utils.make_user_birthday_model(db_user, today)
+              for db_user in db_users],
+        next_cursor=next_cursor
+    )
     return response
 
 
@@ -208,24 +579,38 @@ def private_create_users(create_user_data: schemas.PrivateCreateUserModel,
                              403: {"model": exc.CodelessErrorResponseModel},
                              404: {"model": exc.CodelessErrorResponseModel}})
 def private_get_user(pk: int,
+                     fields: Optional[str] = Query(
+                         None, description=FIELDS_DESCRIPTION
+                     ),
                      Authorize: AuthJWT = Depends(),
                      db: Session = Depends(db.get_db)):
-    _ = check_jwt_user(Authorize, db, (UserRole.superuser))
-    db_user = utils.get_user_by_id(pk, db)
-    # Формирование модели ответа
-    response = schemas.PrivateDetailUserResponseModel(
-        id=db_user.id,
-        first_name=db_user.first_name,
-        last_name=db_user.last_name,
-        other_name=db_user.other_name,
-        email=db_user.email,
-        phone=db_user.phone,
-        birthday=db_user.birthday,
-        city=db_user.city_id,
-        additional_info=db_user.additional_info,
-        is_admin=db_user.is_superuser(),
+    auth_user = check_jwt_user(Authorize, db, (UserRole.superuser))
+    requested_fields = get_requested_fields(
+        fields, schemas.PrivateDetailUserResponseModel
     )
-    return response
+    key = make_read_key('private_get_user', auth_user.role,
+                        requested_fields, pk)
+    return coalesce_read(
+        key, lambda: render_private_user(pk, requested_fields, db), db
+    )
+
+
+def render_private_user(pk: int,
+                        requested_fields: Optional[List[str]],
+                        db: Session) -> bytes:
+    db_user = repository.get_user_by_id(pk, db, requested_fields)
+    release_db(db)
+    if not db_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Пользователя с таким ID не существует.')
+    if requested_fields:
+        return render_json(
+            utils.make_user_fields_dict(db_user, requested_fields)
+        )
+    # Формирование модели ответа
+    response = utils.make_private_detail_user_model(db_user)
+    return render_json(response)
 
 
 @router_admin.delete(path='/users/{pk}',
@@ -238,7 +623,7 @@ def private_delete_user(pk: int,
                         Authorize: AuthJWT = Depends(),
                         db: Session = Depends(db.get_db)):
     _ = check_jwt_user(Authorize, db, (UserRole.superuser))
-    db_user = utils.get_user_by_id(pk, db)
+    db_user = repository.get_user_by_id(pk, db)
     if db_user:
         utils.delete_in_db(db_user, db)
     else:
@@ -256,37 +641,38 @@ def private_delete_user(pk: int,
                     responses={400: {"model": exc.ErrorResponseModel},
                                401: {"model": exc.CodelessErrorResponseModel},
                                403: {"model": exc.CodelessErrorResponseModel},
-                               404: {"model": exc.CodelessErrorResponseModel}})
+                               404: {"model": exc.CodelessErrorResponseModel},
+                               409: {"model": exc.CodelessErrorResponseModel}})
 def private_patch_user(pk: int,
                        update_user_data: schemas.PrivateUpdateUserModel,
                        Authorize: AuthJWT = Depends(),
                        db: Session = Depends(db.get_db)):
-    auth_user = check_jwt_user(Authorize, db, (UserRole.superuser))
-    db_user = utils.get_user_by_id(pk, db)
-    # Проверяем, есть ли пользователь с введенным логином в базе данных
-    if utils.get_user_by_login(update_user_data.email, db):
+    _ = check_jwt_user(Authorize, db, (UserRole.superuser))
+    db_user = repository.get_user_by_id(pk, db)
+    if not db_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Пользователя с таким ID не существует.')
+    # Проверяем, не занят ли новый логин другим пользователем
+    check_login_available(update_user_data.email, db, pk)
+    city_id = update_user_data.city
+    if city_id is not None and not repository.get_city_by_id(city_id, db):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
-            detail=('Пользователь с таким логином уже существует. '
-                    'Придумайте другой и попробуйте снова.'))
-    # Обновляем поля пользователя в соответствии с данными запроса
-    auth_user: User = utils.update_db_model_instance_fields(
-        model_instance=auth_user,
-        update_instance_data=update_user_data
+            detail=('Города с таким ID нет в базе данных.'))
+    utils.replicate_city(city_id)
+    # Обновляем поля пользователя в соответствии с данными запроса;
+    # город и роль хранятся в столбцах city_id и role
+    db_user: User = utils.update_db_model_instance_fields(
+        model_instance=db_user,
+        update_instance_data=update_user_data.copy(
+            exclude={'city', 'is_admin'}
+        )
     )
+    utils.update_user_city_and_role(db_user, update_user_data)
     # Формирование модели ответа
-    response = schemas.PrivateDetailUserResponseModel(
-        id=db_user.id,
-        first_name=db_user.first_name,
-        last_name=db_user.last_name,
-        other_name=db_user.other_name,
-        email=db_user.email,
-        phone=db_user.phone,
-        birthday=db_user.birthday,
-        city=db_user.city_id,
-        additional_info=db_user.additional_info,
-        is_admin=db_user.is_superuser(),
-    )
+    response = utils.make_private_detail_user_model(db_user)
     # Сохраняем изменения в базе данных
     utils.update_in_db(db_user, db)
+    release_db(db)
     return response
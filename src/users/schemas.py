@@ -1,9 +1,12 @@
 from datetime import date
+from enum import Enum
 from typing import List, Optional
 
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, EmailStr, conlist, root_validator, validator
 import phonenumbers
 
+from core.config import BATCH_MAX_IDS
+
 
 class UserDataValidateMixin:
     @validator('phone')
@@ -29,6 +32,8 @@ class PaginatedMetaDataModel(BaseModel):
     total: int
     page: int
     size: int
+    # ID последнего пользователя страницы для параметра after
+    next_cursor: Optional[int] = None
 
 
 class CurrentUserResponseModel(BaseModel):
@@ -131,3 +136,120 @@ class PrivateUsersListMetaDataModel(BaseModel):
 class PrivateUsersListResponseModel(BaseModel):
     data: List[UsersListElementModel]
     meta: PrivateUsersListMetaDataModel
+
+
+class PrivateUsersBatchModel(BaseModel):
+    ids: conlist(int, min_items=1, max_items=BATCH_MAX_IDS)
+
+
+class PrivateUsersBatchResponseModel(BaseModel):
+    data: List[PrivateDetailUserResponseModel]
+    not_found: List[int]
+
+
+class PrivateUsersFilterModel(BaseModel):
+    ids: Optional[conlist(int, min_items=1)] = None
+    city: Optional[int] = None
+    is_admin: Optional[bool] = None
+
+    @root_validator
+    def validate_not_empty(cls, values):
+        if all(value is None for value in values.values()):
+            raise ValueError('Необходимо указать хотя бы одно условие отбора')
+        return values
+
+
+class PrivateUsersBulkValuesModel(BaseModel):
+    city: Optional[int] = None
+    additional_info: Optional[str] = None
+    is_admin: Optional[bool] = None
+
+    @root_validator
+    def validate_not_empty(cls, values):
+        if all(value is None for value in values.values()):
+            raise ValueError('Необходимо указать хотя бы одно новое значение')
+        return values
+
+
+class PrivateUsersBulkUpdateModel(BaseModel):
+    filter: PrivateUsersFilterModel
+    values: PrivateUsersBulkValuesModel
+    dry_run: bool = False
+
+
+class PrivateUsersBulkDeleteModel(BaseModel):
+    filter: PrivateUsersFilterModel
+    dry_run: bool = False
+
+
+class BulkFailureReason(str, Enum):
+    # Нарушено ограничение целостности данных
+    constraint = "constraint"
+    # Потеряно соединение с БД или БД временно недоступна
+    connection = "connection"
+    # Прочие ошибки БД
+    database = "database"
+
+
+class PrivateUsersBulkResponseModel(BaseModel):
+    affected: int
+    dry_run: bool
+    # False, если операция прервана ошибкой после части пачек
+    completed: bool = True
+    error: Optional[BulkFailureReason] = None
+
+
+class UserChangeOperation(str, Enum):
+    created = "created"
+    updated = "updated"
+    deleted = "deleted"
+
+
+class UserChangeModel(BaseModel):
+    change_seq: int
+    operation: UserChangeOperation
+    id: int
+    user: Optional[PrivateDetailUserResponseModel] = None
+
+
+class UsersChangesResponseModel(BaseModel):
+    data: List[UserChangeModel]
+    next_cursor: str
+
+
+class CityUsersStatsModel(BaseModel):
+    city: Optional[int]
+    count: int
+
+
+class RoleUsersStatsModel(BaseModel):
+    is_admin: bool
+    count: int
+
+
+class BirthdayMonthUsersStatsModel(BaseModel):
+    month: Optional[int]
+    count: int
+
+
+class UsersStatsResponseModel(BaseModel):
+    total: int
+    cities: List[CityUsersStatsModel]
+    roles: List[RoleUsersStatsModel]
+    birthday_months: List[BirthdayMonthUsersStatsModel]
+
+
+class UserBirthdayModel(BaseModel):
+    id: int
+    first_name: str
+    last_name: str
+    other_name: Optional[str] = None
+    email: EmailStr
+    phone: Optional[str] = None
+    birthday: date
+    next_birthday: date
+
+
+class UsersBirthdaysResponseModel(BaseModel):
+    data: List[UserBirthdayModel]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,174 @@
+'''Статистика пользователей по городам, ролям и месяцам рождения.
+
+Счетчики в таблице user_stats меняются в той же транзакции, что и сами
+пользователи, поэтому ответ со статистикой читает несколько десятков
+строк независимо от числа пользователей. При шардировании счетчики
+хранятся в шарде пользователя и суммируются при чтении.
+'''
+
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Any, DefaultDict, Dict, List, Optional, Tuple
+
+from sqlalchemy import Row, inspect, select
+from sqlalchemy.orm import Session
+
+from core.database import engine, shard_engines, shard_for
+from .models import User, UserRole, UserStat, UserStatDimension
+from . import schemas
+
+if engine.dialect.name == 'postgresql':
+    from sqlalchemy.dialects.postgresql import insert as upsert
+else:
+    from sqlalchemy.dialects.sqlite import insert as upsert
+
+
+# Признак и его значение, по которым считаются пользователи
+UserStatKey = Tuple[str, str]
+# Изменения счетчиков по шардам
+UsersStatsDelta = DefaultDict[str, Counter]
+
+# Признаки пользователя, от которых зависят счетчики
+USER_STATS_ATTRIBUTES = ('city_id', 'role', 'birthday')
+
+
+def make_users_stats_delta() -> UsersStatsDelta:
+    return defaultdict(Counter)
+
+
+def make_user_stats_keys(city_id: Optional[int],
+                         role: str,
+                         birthday: Optional[date]) -> List[UserStatKey]:
+    return [
+        (UserStatDimension.city.value,
+         '' if city_id is None else str(city_id)),
+        # До сохранения роль нового пользователя может быть не задана
+        (UserStatDimension.role.value, UserRole(role or UserRole.basic).value),
+        (UserStatDimension.birthday_month.value,
+         '' if birthday is None else str(birthday.month)),
+    ]
+
+
+def count_user(delta: UsersStatsDelta,
+               user_id: Optional[int],
+               city_id: Optional[int],
+               role: str,
+               birthday: Optional[date],
+               sign: int = 1) -> None:
+    '''Учет пользователя в изменениях счетчиков: sign=1 - добавлен,
+    sign=-1 - удален'''
+    keys = make_user_stats_keys(city_id, role, birthday)
+    delta[shard_for(user_id)].update(dict.fromkeys(keys, sign))
+
+
+def lock_user_stats_row(user_id: int, db: Session) -> Optional[Row]:
+    '''Сохраненные в БД признаки пользователя (city_id, role, birthday)
+    с блокировкой строки до конца транзакции.
+
+    Значения, загруженные в сессию раньше, могли устареть: две
+    параллельные транзакции вычли бы из счетчиков одно и то же старое
+    значение. Читать нужно после первой записи транзакции (номера
+    изменения), чтобы в SQLite уже держалась блокировка записи.
+    '''
+    return db.execute(
+        select(User.city_id, User.role, User.birthday)
+        .where(User.id == user_id)
+        .with_for_update()
+    ).first()
+
+
+def count_user_update(delta: UsersStatsDelta,
+                      user: User,
+                      stored: Row) -> None:
+    '''Учет изменения пользователя: старые значения - строка stored из
+    lock_user_stats_row, новые - измененные в сессии атрибуты поверх нее
+    (неизмененные атрибуты сохранятся в БД такими же, как в stored)'''
+    state = inspect(user)
+    new_values: Dict[str, Any] = {}
+    for attribute in USER_STATS_ATTRIBUTES:
+        if state.attrs[attribute].history.added:
+            new_values[attribute] = getattr(user, attribute)
+        else:
+            new_values[attribute] = getattr(stored, attribute)
+    count_user(delta, user.id, *stored, sign=-1)
+    count_user(delta, user.id, **new_values)
+
+
+def count_users_rows(delta: UsersStatsDelta,
+                     rows: List[Row],
+                     values: Optional[Dict[str, Any]] = None) -> None:
+    '''Учет массового изменения (values - новые значения столбцов)
+    или удаления (values=None) строк (id, city_id, role, birthday)'''
+    for row in rows:
+        count_user(delta, *row, sign=-1)
+        if values is not None:
+            count_user(delta,
+                       row.id,
+                       values.get('city_id', row.city_id),
+                       values.get('role', row.role),
+                       row.birthday)
+
+
+def apply_users_stats_delta(delta: UsersStatsDelta, db: Session) -> None:
+    '''Применение изменений счетчиков одним upsert на шард'''
+    for shard_id, counter in delta.items():
+        values = [
+            {'dimension': dimension, 'key': key, 'count': count}
+            for (dimension, key), count in counter.items() if count
+        ]
+        if not values:
+            continue
+        statement = upsert(UserStat).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[UserStat.dimension, UserStat.key],
+            set_={'count': UserStat.count + statement.excluded.count}
+        )
+        db.execute(statement, bind_arguments={'shard_id': shard_id})
+
+
+def get_users_stats(db: Session) -> Dict[str, Counter]:
+    '''Сумма счетчиков всех шардов по признакам'''
+    stats: Dict[str, Counter] = defaultdict(Counter)
+    statement = select(UserStat.dimension, UserStat.key, UserStat.count) \
+        .where(UserStat.count != 0)
+    for shard_id in shard_engines:
+        rows = db.execute(statement, bind_arguments={'shard_id': shard_id})
+        for dimension, key, count in rows:
+            stats[dimension][key] += count
+    return stats
+
+
+def sort_numeric_stats(counter: Counter) -> List[Tuple[Optional[int], int]]:
+    '''Счетчики по возрастанию числового ключа, не указанное значение -
+    в конце'''
+    stats: List[Tuple[Optional[int], int]] = sorted(
+        (int(key), count) for key, count in counter.items() if key
+    )
+    if counter.get(''):
+        stats.append((None, counter['']))
+    return stats
+
+
+def make_users_stats_model(
+    stats: Dict[str, Counter]
+) -> schemas.UsersStatsResponseModel:
+    cities = stats[UserStatDimension.city.value]
+    roles = stats[UserStatDimension.role.value]
+    months = stats[UserStatDimension.birthday_month.value]
+    return schemas.UsersStatsResponseModel(
+        total=sum(roles.values()),
+        cities=[
+            schemas.CityUsersStatsModel(city=city, count=count)
+            for city, count in sort_numeric_stats(cities)
+        ],
+        roles=[
+            schemas.RoleUsersStatsModel(
+                is_admin=role == UserRole.superuser, count=count
+            )
+            for role, count in sorted(roles.items())
+        ],
+        birthday_months=[
+            schemas.BirthdayMonthUsersStatsModel(month=month, count=count)
+            for month, count in sort_numeric_stats(months)
+        ],
+    )
@@ -1,33 +1,131 @@
-from typing import List, Tuple, Optional, NewType
+import logging
+from calendar import isleap
+from datetime import date, datetime, timedelta
+from itertools import chain, dropwhile
+from operator import attrgetter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Tuple,
+    Type,
+    Optional,
+    NewType,
+)
 
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    delete,
+    func,
+    insert,
+    inspect,
+    literal,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.exc import IntegrityError, OperationalError, SQLAlchemyError
+from sqlalchemy.orm import Session, load_only
 from pydantic import BaseModel
 
-from core.database import Base
-from .models import User, City
-from . import schemas
+from core.cache import ResponseCache
+from core.metrics import metrics
+from core.config import (
+    BULK_CHUNK_SIZE,
+    USERS_PAGES_CACHE_MAX_BYTES,
+    USERS_PAGES_CACHE_TTL,
+)
+from core.database import (
+    USERS_SHARDED,
+    Base,
+    SessionLocal,
+    replicate_table,
+    shard_engines,
+    shard_for,
+)
+from .models import (
+    City,
+    User,
+    make_birthday_key,
+    UserRole,
+    UserChangeCounter,
+    UserIdSequence,
+    UserLogin,
+    UserTombstone,
+)
+from .repository import USER_FIELDS_COLUMNS
+from . import repository, schemas, stats
 
 
-UsersWithCities = NewType(
-    'UsersWithCities',
-    Tuple[List[schemas.UsersListElementModel],
-          List[schemas.CitiesHintModel]]
+# Страница списка: пользователи, подсказка по городам и ID последнего
+# пользователя полной страницы (курсор следующей страницы)
+UsersPage = NewType(
+    'UsersPage',
+    Tuple[List[Dict[str, Any]],
+          List[schemas.CitiesHintModel],
+          Optional[int]]
 )
+logger = logging.getLogger(__name__)
+
+# Сериализованные страницы списков пользователей; очищается при
+# любом изменении пользователей в этом процессе
+users_pages_cache = ResponseCache(
+    'users.pages_cache', USERS_PAGES_CACHE_MAX_BYTES, USERS_PAGES_CACHE_TTL
+)
+# Позиция в ленте изменений: (номер изменения, ID пользователя)
+ChangesCursor = NewType('ChangesCursor', Tuple[int, int])
+# Позиция в списке ближайших дней рождения: (ключ дня рождения, ID)
+BirthdaysCursor = NewType('BirthdaysCursor', Tuple[int, int])
+# Столбцы, нужные для ответа со списком ближайших дней рождения
+BIRTHDAY_USER_COLUMNS = (
+    User.first_name,
+    User.last_name,
+    User.other_name,
+    User.email,
+    User.phone,
+    User.birthday,
+    User.birthday_key,
+)
+# Результат массовой операции: число измененных пользователей и причина
+# остановки (None, если обработаны все пачки)
+BulkResult = NewType(
+    'BulkResult', Tuple[int, Optional[schemas.BulkFailureReason]]
+)
+# Изменение пользователя; для удаленных пользователей объект равен None
+UserChange = NewType('UserChange', Tuple[int, int, Optional[User]])
 
 
-def get_user_by_id(id: int, db: Session) -> Optional[User]:
-    user = db.query(User).filter(User.id == id).first()
-    return user
+def parse_fields(fields: Optional[str],
+                 model: Type[BaseModel]) -> Optional[List[str]]:
+    '''Разбор параметра fields=id,email; при неизвестных полях - ValueError'''
+    if fields is None:
+        return None
+    requested = list(dict.fromkeys(
+        field.strip() for field in fields.split(',') if field.strip()
+    ))
+    if not requested or not set(requested) <= set(model.__fields__):
+        raise ValueError(fields)
+    return requested
 
 
-def get_user_by_login(login: str, db: Session) -> Optional[User]:
-    user = db.query(User).filter(User.email == login).first()
-    return user
+def make_user_fields_dict(db_user: User, fields: List[str]) -> Dict[str, Any]:
+    '''Значения только запрошенных полей пользователя'''
+    values = {}
+    for field in fields:
+        if field == 'is_admin':
+            values[field] = db_user.is_superuser()
+        else:
+            values[field] = getattr(db_user, USER_FIELDS_COLUMNS[field].key)
+    return values
 
 
-def get_city_by_id(id: int, db: Session) -> Optional[City]:
-    city = db.query(City).filter(City.id == id).first()
-    return city
+def get_users_by_ids(ids: List[int], db: Session) -> List[User]:
+    '''Получение пользователей по списку ID одним запросом'''
+    users = db.query(User).filter(User.id.in_(ids)).all()
+    return users
 
 
 def update_db_model_instance_fields(model_instance: Base,
@@ -39,44 +137,660 @@ def update_db_model_instance_fields(model_instance: Base,
     return model_instance
 
 
-def get_users_list_with_cities_hint(page: int,
-                                    size: int,
-                                    db: Session) -> UsersWithCities:
-    # Получаем номер первого элемента на странице
-    first_item = (page - 1) * size
+def update_user_city_and_role(
+    db_user: User,
+    update_user_data: schemas.PrivateUpdateUserModel
+) -> None:
+    if update_user_data.city is not None:
+        db_user.city_id = update_user_data.city
+    if update_user_data.is_admin is not None:
+        db_user.role = \
+            UserRole.superuser if update_user_data.is_admin else UserRole.basic
+
+
+def make_private_detail_user_model(
+    db_user: User
+) -> schemas.PrivateDetailUserResponseModel:
+    return schemas.PrivateDetailUserResponseModel(
+        id=db_user.id,
+        first_name=db_user.first_name,
+        last_name=db_user.last_name,
+        other_name=db_user.other_name,
+        email=db_user.email,
+        phone=db_user.phone,
+        birthday=db_user.birthday,
+        city=db_user.city_id,
+        additional_info=db_user.additional_info,
+        is_admin=db_user.is_superuser(),
+    )
+
+
+def get_users_page(query: Select,
+                   page: int,
+                   size: int,
+                   after: Optional[int],
+                   db: Session) -> List[User]:
+    '''Пользователи страницы списка по возрастанию ID: после ID курсора
+    after, а без курсора - по номеру страницы'''
+    if after is not None:
+        query = query.where(User.id > after)
+        first_item = 0
+    else:
+        # Получаем номер первого элемента на странице
+        first_item = (page - 1) * size
+    if not USERS_SHARDED:
+        return db.scalars(query.limit(size).offset(first_item)).all()
+    if first_item:
+        # Смещение считается по ID, которые шарды отдают до конца
+        # страницы; целиком загружаются только строки самой страницы
+        ids = merge_shards_results(
+            db.scalars(
+                select(User.id).order_by(User.id).limit(first_item + size)
+            ).all(),
+            int
+        )[first_item:first_item + size]
+        query = query.where(User.id.in_(ids))
+    # Каждый шард отдает не больше size строк, страница вырезается
+    # после слияния по ID
+    return merge_shards_results(
+        db.scalars(query.limit(size)).all(), attrgetter('id')
+    )[:size]
+
+
+def get_users_list_with_cities_hint(
+    page: int,
+    size: int,
+    db: Session,
+    fields: Optional[List[str]] = None,
+    after: Optional[int] = None
+) -> UsersPage:
+    fields = fields or list(schemas.UsersListElementModel.__fields__)
+    # Загружаем только столбцы запрошенных полей и город для подсказки,
+    # крупный additional_info при этом не читается
+    columns = [USER_FIELDS_COLUMNS[field] for field in fields]
     # Получаем список пользователей, соответствующих текущей странице и размеру
-    db_users = db.query(User).limit(size).offset(first_item).all()
-    # Создаем список пользователей по Pydantic схеме
-    users: List[schemas.UsersListElementModel] = []
+    query = select(User) \
+        .options(load_only(*columns, User.city_id)) \
+        .order_by(User.id)
+    db_users = get_users_page(query, page, size, after, db)
+    # Создаем список пользователей с запрошенными полями
+    users: List[Dict[str, Any]] = []
     cities_hint: List[schemas.CitiesHintModel] = []
     for db_user in db_users:
-        user_model = schemas.UsersListElementModel(
-            id=db_user.id,
-            first_name=db_user.first_name,
-            last_name=db_user.last_name,
-            email=db_user.email
-        )
-        users.append(user_model)
+        users.append(make_user_fields_dict(db_user, fields))
         if db_user.city_id:
             city_hint = schemas.CitiesHintModel(
                 id=db_user.city_id,
                 name=db_user.city.name
             )
             cities_hint.append(city_hint)
-    return users, cities_hint
+    next_after = db_users[-1].id if len(db_users) == size else None
+    return users, cities_hint, next_after
+
+
+def merge_shards_results(rows: List[Any], key: Callable) -> List[Any]:
+    '''Слияние результатов запроса со всех шардов в порядке ключа.
+
+    Шарды возвращают отсортированные отрезки подряд друг за другом,
+    сортировка (timsort) сливает такие отрезки за линейное время.
+    '''
+    return sorted(rows, key=key)
+
+
+def next_sequence_value(sequence: Type[Base], db: Session) -> int:
+    '''Выделение следующего значения счетчика в основной базе'''
+    value = db.scalar(insert(sequence).returning(sequence.id))
+    # Строка нужна только для получения номера, сам счетчик не сбрасывается
+    db.execute(delete(sequence).where(sequence.id == value))
+    return value
+
+
+def next_change_seq(shard_id: str, db: Session) -> int:
+    '''Выделение следующего номера изменения для ленты изменений.
+
+    У каждого шарда свой счетчик, и номер фиксируется в одной транзакции
+    с изменением пользователя. Строка счетчика остается заблокированной
+    до конца транзакции, поэтому все изменения пользователей одного шарда
+    выполняются последовательно: пропускная способность записи шарда
+    ограничена одной транзакцией за раз (SQLite и так допускает только
+    одного пишущего). Чтобы время блокировки было коротким, номер
+    выделяется непосредственно перед фиксацией изменений, а массовые
+    операции держат ее не дольше одной пачки (BULK_CHUNK_SIZE).
+    Для увеличения пропускной способности записи увеличьте USERS_SHARDS.
+    '''
+    change_seq = db.scalar(
+        update(UserChangeCounter)
+        .values(value=UserChangeCounter.value + 1)
+        .returning(UserChangeCounter.value)
+        .execution_options(synchronize_session=False),
+        bind_arguments={'shard_id': shard_id}
+    )
+    if change_seq is None:
+        raise RuntimeError(
+            f'В шарде {shard_id} нет строки счетчика изменений '
+            f'{UserChangeCounter.__tablename__}: примените миграции')
+    return change_seq
+
+
+def get_changes_horizon(shard_id: str, db: Session) -> int:
+    '''Номер изменения шарда, до которого включительно все изменения уже
+    зафиксированы: больший номер может принадлежать открытой транзакции'''
+    return db.scalar(select(UserChangeCounter.value),
+                     bind_arguments={'shard_id': shard_id})
+
+
+def mark_user_changed(user: User, db: Session) -> None:
+    user.change_seq = next_change_seq(shard_for(user.id), db)
+    user.updated_at = datetime.utcnow()
+
+
+def replicate_city(city_id: Optional[int]) -> None:
+    '''Копирование города в шарды перед записью пользователя с этим
+    городом: город, добавленный в основную базу после запуска приложения,
+    иначе есть только в ней'''
+    if USERS_SHARDED and city_id is not None:
+        replicate_table(City.__table__, City.id == city_id)
+
+
+def allocate_user_id() -> int:
+    '''Выделение ID нового пользователя отдельной транзакцией в основной
+    базе. Если строка пользователя затем не будет записана, в ID останется
+    пропуск: это безопасно, ID не обязаны идти подряд.'''
+    with SessionLocal() as sequence_db:
+        user_id = next_sequence_value(UserIdSequence, sequence_db)
+        sequence_db.commit()
+    return user_id
+
+
+def claim_user_login(login: str, user_id: int) -> None:
+    '''Запись логина в справочник отдельной транзакцией до фиксации строки
+    пользователя в его шарде.
+
+    Общей транзакции между шардами нет, поэтому после сбоя между двумя
+    фиксациями в справочнике может остаться запись, указывающая на
+    отсутствующего пользователя или на пользователя с другим email. Вход
+    такие записи не использует (см. repository.get_user_by_login), а здесь
+    они заменяются новой записью.
+    '''
+    with SessionLocal() as directory:
+        if repository.get_user_by_login(login, directory) is None:
+            directory.execute(
+                delete(UserLogin).where(UserLogin.login == login)
+            )
+        directory.add(UserLogin(login=login, user_id=user_id))
+        directory.commit()
+
+
+def release_users_logins(logins: List[str], user_ids: List[int]) -> None:
+    '''Удаление записей справочника логинов после фиксации изменений
+    пользователей; запись, уже выданная другому пользователю, остается.
+
+    Изменения пользователей к этому моменту уже зафиксированы, поэтому
+    ошибка здесь только записывается в журнал: оставшиеся записи вход не
+    использует, и их заменит следующая регистрация с тем же логином.
+    '''
+    if not USERS_SHARDED or not logins:
+        return
+    try:
+        with SessionLocal() as directory:
+            directory.execute(
+                delete(UserLogin).where(UserLogin.login.in_(logins),
+                                        UserLogin.user_id.in_(user_ids))
+            )
+            directory.commit()
+    except SQLAlchemyError:
+        logger.exception('Не удалось удалить записи справочника логинов '
+                         'пользователей %s', user_ids)
+
+
+def claim_changed_user_login(user: User) -> List[str]:
+    '''Запись нового логина при смене email; возвращает прежние логины,
+    которые освобождаются после фиксации строки пользователя'''
+    history = inspect(user).attrs.email.history
+    if not USERS_SHARDED or not history.added:
+        return []
+    claim_user_login(user.email, user.id)
+    return list(history.deleted)
 
 
 def update_in_db(model_instance: Base, db: Session) -> None:
+    released_logins: List[str] = []
+    if isinstance(model_instance, User):
+        released_logins = claim_changed_user_login(model_instance)
+        # Измененные атрибуты записываются в БД только после чтения
+        # сохраненных значений для счетчиков
+        with db.no_autoflush:
+            mark_user_changed(model_instance, db)
+            stored = stats.lock_user_stats_row(model_instance.id, db)
+            delta = stats.make_users_stats_delta()
+            stats.count_user_update(delta, model_instance, stored)
+            stats.apply_users_stats_delta(delta, db)
     db.commit()
+    release_users_logins(released_logins, [model_instance.id])
+    users_pages_cache.clear()
     db.refresh(model_instance)
 
 
 def add_in_db(model_instance: Base, db: Session) -> None:
+    if isinstance(model_instance, User):
+        if USERS_SHARDED:
+            # ID нужен до записи, по нему выбирается шард пользователя
+            model_instance.id = allocate_user_id()
+            claim_user_login(model_instance.email, model_instance.id)
+        mark_user_changed(model_instance, db)
+        model_instance.created_at = model_instance.updated_at
+        delta = stats.make_users_stats_delta()
+        stats.count_user(delta, model_instance.id, model_instance.city_id,
+                         model_instance.role, model_instance.birthday)
+        stats.apply_users_stats_delta(delta, db)
     db.add(model_instance)
     db.commit()
+    users_pages_cache.clear()
     db.refresh(model_instance)
 
 
 def delete_in_db(model_instance: Base, db: Session) -> None:
+    released_logins: List[str] = []
+    released_ids: List[int] = []
+    if isinstance(model_instance, User):
+        change_seq = next_change_seq(shard_for(model_instance.id), db)
+        db.add(UserTombstone(change_seq=change_seq,
+                             user_id=model_instance.id,
+                             deleted_at=datetime.utcnow()))
+        # Логин освобождается только после удаления пользователя
+        released_logins = [model_instance.email]
+        released_ids = [model_instance.id]
+        stored = stats.lock_user_stats_row(model_instance.id, db)
+        delta = stats.make_users_stats_delta()
+        # Пользователь мог быть уже удален параллельным запросом
+        if stored is not None:
+            stats.count_user(delta, model_instance.id, *stored, sign=-1)
+        stats.apply_users_stats_delta(delta, db)
     db.delete(model_instance)
     db.commit()
+    release_users_logins(released_logins, released_ids)
+    users_pages_cache.clear()
+
+
+def make_users_filter_conditions(
+    filter_data: schemas.PrivateUsersFilterModel
+) -> List[ColumnElement]:
+    '''Условия отбора пользователей для массовых операций'''
+    conditions: List[ColumnElement] = []
+    if filter_data.ids is not None:
+        conditions.append(User.id.in_(filter_data.ids))
+    if filter_data.city is not None:
+        conditions.append(User.city_id == filter_data.city)
+    if filter_data.is_admin is not None:
+        role = UserRole.superuser if filter_data.is_admin else UserRole.basic
+        conditions.append(User.role == role)
+    return conditions
+
+
+def make_users_bulk_values(
+    values_data: schemas.PrivateUsersBulkValuesModel
+) -> Dict[str, Any]:
+    '''Значения столбцов для массового обновления пользователей'''
+    values: Dict[str, Any] = {}
+    if values_data.city is not None:
+        values['city_id'] = values_data.city
+    if values_data.additional_info is not None:
+        values['additional_info'] = values_data.additional_info
+    if values_data.is_admin is not None:
+        values['role'] = \
+            UserRole.superuser if values_data.is_admin else UserRole.basic
+    return values
+
+
+def count_users(conditions: List[ColumnElement], db: Session) -> int:
+    # При шардировании каждый шард возвращает свое число строк
+    counts = db.scalars(
+        select(func.count()).select_from(User).where(*conditions)
+    )
+    return sum(counts)
+
+
+def iter_user_ids_chunks(conditions: List[ColumnElement],
+                         db: Session,
+                         chunk_size: int = BULK_CHUNK_SIZE
+                         ) -> Iterator[Tuple[str, List[int]]]:
+    '''Постраничный обход ID подходящих пользователей по возрастанию ID
+    отдельно в каждом шарде: пачка не выходит за пределы одного шарда'''
+    for shard_id in shard_engines:
+        last_id = None
+        while True:
+            statement = select(User.id).where(*conditions)
+            if last_id is not None:
+                statement = statement.where(User.id > last_id)
+            ids = db.scalars(
+                statement.order_by(User.id).limit(chunk_size),
+                bind_arguments={'shard_id': shard_id}
+            ).all()
+            if not ids:
+                break
+            yield shard_id, ids
+            last_id = ids[-1]
+
+
+def update_users_stats(ids: List[int],
+                       conditions: List[ColumnElement],
+                       values: Optional[Dict[str, Any]],
+                       db: Session) -> None:
+    '''Изменение счетчиков статистики для пачки массовой операции.
+    Строки пачки читаются с блокировкой (см. stats.lock_user_stats_row),
+    поэтому вызывается после выделения номера изменения.'''
+    rows = db.execute(
+        select(User.id, User.city_id, User.role, User.birthday)
+        .where(User.id.in_(ids), *conditions)
+        .with_for_update()
+    ).all()
+    delta = stats.make_users_stats_delta()
+    stats.count_users_rows(delta, rows, values)
+    stats.apply_users_stats_delta(delta, db)
+
+
+def update_users_chunk(shard_id: str,
+                       ids: List[int],
+                       conditions: List[ColumnElement],
+                       values: Dict[str, Any],
+                       db: Session) -> int:
+    # Все пользователи пачки получают один номер изменения
+    change_seq = next_change_seq(shard_id, db)
+    update_users_stats(ids, conditions, values, db)
+    statement = update(User) \
+        .where(User.id.in_(ids), *conditions) \
+        .values(**values,
+                change_seq=change_seq,
+                updated_at=datetime.utcnow()) \
+        .execution_options(synchronize_session=False)
+    affected = db.execute(
+        statement, bind_arguments={'shard_id': shard_id}
+    ).rowcount
+    db.commit()
+    return affected
+
+
+def delete_users_chunk(shard_id: str,
+                       ids: List[int],
+                       conditions: List[ColumnElement],
+                       db: Session) -> int:
+    options = {'shard_id': shard_id}
+    logins = db.scalars(
+        select(User.email).where(User.id.in_(ids), *conditions),
+        bind_arguments=options
+    ).all() if USERS_SHARDED else []
+    change_seq = next_change_seq(shard_id, db)
+    update_users_stats(ids, conditions, None, db)
+    tombstones = select(
+        literal(change_seq),
+        User.id,
+        literal(datetime.utcnow())
+    ).where(User.id.in_(ids), *conditions)
+    db.execute(
+        insert(UserTombstone).from_select(
+            ['change_seq', 'user_id', 'deleted_at'], tombstones
+        ),
+        bind_arguments=options
+    )
+    statement = delete(User) \
+        .where(User.id.in_(ids), *conditions) \
+        .execution_options(synchronize_session=False)
+    affected = db.execute(statement, bind_arguments=options).rowcount
+    db.commit()
+    release_users_logins(logins, ids)
+    return affected
+
+
+def get_bulk_failure_reason(
+    error: SQLAlchemyError
+) -> schemas.BulkFailureReason:
+    if isinstance(error, IntegrityError):
+        return schemas.BulkFailureReason.constraint
+    if isinstance(error, OperationalError) \
+            or getattr(error, 'connection_invalidated', False):
+        return schemas.BulkFailureReason.connection
+    return schemas.BulkFailureReason.database
+
+
+def run_bulk_chunks(operation: str,
+                    apply_chunk: Callable[[str, List[int]], int],
+                    conditions: List[ColumnElement],
+                    db: Session) -> BulkResult:
+    '''Выполнение массовой операции пачками по шардам.
+
+    Операция не атомарна: при ошибке БД уже зафиксированные пачки
+    остаются примененными, и возвращается их число строк вместе с
+    причиной остановки.
+    '''
+    affected = 0
+    shard_id, ids = None, []
+    try:
+        for shard_id, ids in iter_user_ids_chunks(conditions, db):
+            affected += apply_chunk(shard_id, ids)
+    except SQLAlchemyError as error:
+        db.rollback()
+        metrics.inc('users.bulk.failed')
+        logger.exception(
+            'Массовая операция %s прервана на пачке шарда %s '
+            '(ID %s-%s, %s шт.), уже изменено пользователей: %s',
+            operation, shard_id, ids[0], ids[-1], len(ids), affected
+        )
+        return affected, get_bulk_failure_reason(error)
+    finally:
+        users_pages_cache.clear()
+    return affected, None
+
+
+def bulk_update_in_db(conditions: List[ColumnElement],
+                      values: Dict[str, Any],
+                      db: Session) -> BulkResult:
+    '''Массовое обновление пользователей пачками: каждая пачка -
+    один UPDATE в отдельной транзакции одного шарда, чтобы не держать
+    долгих блокировок'''
+    return run_bulk_chunks(
+        'update',
+        lambda shard_id, ids: update_users_chunk(
+            shard_id, ids, conditions, values, db
+        ),
+        conditions, db
+    )
+
+
+def bulk_delete_in_db(conditions: List[ColumnElement],
+                      db: Session) -> BulkResult:
+    '''Массовое удаление пользователей пачками, аналогично обновлению'''
+    return run_bulk_chunks(
+        'delete',
+        lambda shard_id, ids: delete_users_chunk(
+            shard_id, ids, conditions, db
+        ),
+        conditions, db
+    )
+
+
+def encode_cursor(cursor: Tuple[int, int]) -> str:
+    return '{}.{}'.format(*cursor)
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    '''Разбор курсора вида "ключ.ID", при ошибке - ValueError'''
+    key, user_id = cursor.split('.')
+    return int(key), int(user_id)
+
+
+def decode_changes_cursor(cursor: str) -> List[ChangesCursor]:
+    '''Разбор курсора ленты изменений: позиции "номер.ID" всех шардов
+    через запятую, одна позиция относится ко всем шардам сразу;
+    при ошибке - ValueError'''
+    positions = [decode_cursor(position) for position in cursor.split(',')]
+    if len(positions) == 1:
+        return positions * len(shard_engines)
+    if len(positions) != len(shard_engines):
+        raise ValueError('Число позиций курсора не совпадает с числом шардов')
+    return positions
+
+
+def encode_changes_cursor(positions: List[ChangesCursor]) -> str:
+    # Без шардирования курсор остается одной позицией "номер.ID"
+    return ','.join(encode_cursor(position) for position in positions)
+
+
+def get_shard_users_changes(shard_id: str,
+                            cursor: ChangesCursor,
+                            size: int,
+                            db: Session) -> List[UserChange]:
+    '''Изменения пользователей одного шарда после позиции курсора.
+
+    Измененные и созданные пользователи берутся из users, удаленные - из
+    user_tombstones; обе выборки идут по индексам (change_seq, id).
+    Отдаются только изменения не новее горизонта шарда, иначе курсор
+    читателя мог бы обогнать номер еще не зафиксированной транзакции.
+    '''
+    options = {'shard_id': shard_id}
+    horizon = get_changes_horizon(shard_id, db)
+    db_users = db.scalars(
+        select(User)
+        .where(tuple_(User.change_seq, User.id) > cursor,
+               User.change_seq <= horizon)
+        .order_by(User.change_seq, User.id)
+        .limit(size),
+        bind_arguments=options
+    ).all()
+    tombstones = db.execute(
+        select(UserTombstone.change_seq, UserTombstone.user_id)
+        .where(tuple_(UserTombstone.change_seq,
+                      UserTombstone.user_id) > cursor,
+               UserTombstone.change_seq <= horizon)
+        .order_by(UserTombstone.change_seq, UserTombstone.user_id)
+        .limit(size),
+        bind_arguments=options
+    ).all()
+    return list(chain(
+        ((user.change_seq, user.id, user) for user in db_users),
+        ((change_seq, user_id, None) for change_seq, user_id in tombstones)
+    ))
+
+
+def get_users_changes(positions: List[ChangesCursor],
+                      size: int,
+                      db: Session) -> List[UserChange]:
+    '''Изменения пользователей после позиций курсора.
+
+    Номера изменений у каждого шарда свои, поэтому позиция курсора тоже
+    хранится для каждого шарда; изменения шардов сливаются в одну
+    последовательность по (номер изменения, ID).
+    '''
+    changes: List[UserChange] = []
+    for shard_id, cursor in zip(shard_engines, positions):
+        changes.extend(get_shard_users_changes(shard_id, cursor, size, db))
+    return merge_shards_results(changes, key=lambda change: change[:2])[:size]
+
+
+def advance_changes_cursor(positions: List[ChangesCursor],
+                           changes: List[UserChange]) -> List[ChangesCursor]:
+    '''Позиции шардов после отданных изменений'''
+    shards_positions = dict(zip(shard_engines, positions))
+    for change in changes:
+        shards_positions[shard_for(change[1])] = change[:2]
+    return list(shards_positions.values())
+
+
+def make_user_change_model(change: UserChange) -> schemas.UserChangeModel:
+    change_seq, user_id, db_user = change
+    if db_user is None:
+        return schemas.UserChangeModel(
+            change_seq=change_seq,
+            operation=schemas.UserChangeOperation.deleted,
+            id=user_id
+        )
+    # Пользователи, созданные до появления ленты, получили при миграции
+    # одинаковые created_at и updated_at и до первого изменения
+    # отдаются как созданные
+    if db_user.created_at == db_user.updated_at:
+        operation = schemas.UserChangeOperation.created
+    else:
+        operation = schemas.UserChangeOperation.updated
+    return schemas.UserChangeModel(
+        change_seq=change_seq,
+        operation=operation,
+        id=user_id,
+        user=make_private_detail_user_model(db_user)
+    )
+
+
+def get_birthdays_ranges(today: date, days: int) -> List[Tuple[int, int]]:
+    '''Диапазоны ключей дней рождения для дней [today, today + days)
+    в порядке наступления; при переходе через новый год - два диапазона'''
+    end = today + timedelta(days=days - 1)
+    start_key = make_birthday_key(today)
+    end_key = make_birthday_key(end)
+    # В невисокосный год родившиеся 29 февраля празднуют 1 марта
+    if start_key == 301 and not isleap(today.year):
+        start_key = 229
+    if end.year == today.year:
+        return [(start_key, end_key)]
+    return [(start_key, 1231), (101, end_key)]
+
+
+def decode_birthdays_cursor(cursor: str,
+                            ranges: List[Tuple[int, int]]) -> BirthdaysCursor:
+    '''Разбор курсора списка дней рождения. Курсор, выданный в другой
+    день, может указывать за пределы текущих диапазонов: такой курсор
+    считается неверным (ValueError), а не концом списка.'''
+    position = decode_cursor(cursor)
+    if not any(low <= position[0] <= high for low, high in ranges):
+        raise ValueError('Курсор вне диапазонов дней рождения')
+    return position
+
+
+def get_upcoming_birthdays(ranges: List[Tuple[int, int]],
+                           cursor: Optional[BirthdaysCursor],
+                           size: int,
+                           db: Session) -> List[User]:
+    '''Пользователи с днями рождения из диапазонов по порядку ключей;
+    каждый диапазон читается по индексу (birthday_key, id)'''
+    if cursor is not None:
+        # Продолжаем с диапазона, на котором остановилась прошлая страница
+        ranges = list(dropwhile(
+            lambda keys: not keys[0] <= cursor[0] <= keys[1], ranges
+        ))
+    db_users: List[User] = []
+    for low, high in ranges:
+        remaining = size - len(db_users)
+        query = db.query(User) \
+            .options(load_only(*BIRTHDAY_USER_COLUMNS)) \
+            .filter(User.birthday_key.between(low, high))
+        if cursor is not None and low <= cursor[0] <= high:
+            query = query.filter(tuple_(User.birthday_key, User.id) > cursor)
+        db_users += merge_shards_results(
+            query.order_by(User.birthday_key, User.id).limit(remaining).all(),
+            attrgetter('birthday_key', 'id')
+        )[:remaining]
+        if len(db_users) == size:
+            break
+    return db_users
+
+
+def get_next_birthday(birthday: date, today: date) -> date:
+    '''Ближайшая к today (включительно) дата дня рождения'''
+    for year in (today.year, today.year + 1):
+        if birthday.month == 2 and birthday.day == 29 and not isleap(year):
+            next_birthday = date(year, 3, 1)
+        else:
+            next_birthday = birthday.replace(year=year)
+        if next_birthday >= today:
+            return next_birthday
+
+
+def make_user_birthday_model(db_user: User,
+                             today: date) -> schemas.UserBirthdayModel:
+    return schemas.UserBirthdayModel(
+        id=db_user.id,
+        first_name=db_user.first_name,
+        last_name=db_user.last_name,
+        other_name=db_user.other_name,
+        email=db_user.email,
+        phone=db_user.phone,
+        birthday=db_user.birthday,
+        next_birthday=get_next_birthday(db_user.birthday, today)
+    )
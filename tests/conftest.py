@@ -0,0 +1,93 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+from passlib import hash as _hash
+from sqlalchemy import create_engine, insert
+from sqlalchemy.pool import NullPool
+
+
+# Приложение импортируется из src и настраивается через окружение;
+# базы приложения создаются во временном каталоге
+os.environ.setdefault('DEBUG', 'True')
+os.environ.setdefault('AUTH_JWT_SECRET_KEY', 'test-secret')
+os.environ.setdefault('DATABASES_DIR', tempfile.mkdtemp())
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from auth import limiter  # noqa: E402
+from core.database import (  # noqa: E402
+    USERS_SHARDED,
+    Base,
+    SessionLocal,
+    shard_engines,
+)
+from main import app  # noqa: E402
+from users import utils  # noqa: E402
+from users.models import City, User, UserRole  # noqa: E402
+
+PASSWORD = 'password'
+
+
+@pytest.fixture
+def engine(tmp_path):
+    '''Отдельная база SQLite в файле: каждое соединение - отдельный клиент,
+    как у параллельных запросов к приложению. База одна, поэтому при
+    запуске с шардами такие тесты пропускаются (см. test_sharding)'''
+    if USERS_SHARDED:
+        pytest.skip('тест одной базы')
+    engine = create_engine(f'sqlite:///{tmp_path / "test.db"}',
+                           poolclass=NullPool)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def app_db():
+    '''Пустые базы приложения (основная и шарды) с двумя городами'''
+    for shard_engine in shard_engines.values():
+        Base.metadata.drop_all(shard_engine)
+        Base.metadata.create_all(shard_engine)
+    with shard_engines['0'].begin() as connection:
+        connection.execute(insert(City), [{'name': 'Moscow'},
+                                          {'name': 'Kazan'}])
+    utils.users_pages_cache.clear()
+    yield shard_engines
+
+
+@pytest.fixture
+def add_user(app_db):
+    '''Добавление пользователя в базы приложения с паролем PASSWORD'''
+    hashed_password = _hash.bcrypt.hash(PASSWORD)
+
+    def add(email: str, role: str = UserRole.basic, **fields) -> User:
+        user = User(first_name='Ivan', last_name='Ivanov', email=email,
+                    role=role, hashed_password=hashed_password, **fields)
+        with SessionLocal() as db:
+            utils.add_in_db(user, db)
+        return user
+
+    return add
+
+
+@pytest.fixture
+def client(app_db, monkeypatch):
+    '''Клиент приложения со свежими лимитами попыток входа. Cookie JWT
+    выдаются с флагом Secure, поэтому запросы идут по https'''
+    backend = limiter.InMemoryRateLimitBackend()
+    monkeypatch.setattr(limiter.ip_limiter, 'backend', backend)
+    monkeypatch.setattr(limiter.login_limiter, 'backend', backend)
+    with TestClient(app, base_url='https://testserver') as client:
+        yield client
+
+
+@pytest.fixture
+def admin_client(client, add_user):
+    '''Клиент, вошедший в систему администратором'''
+    add_user('admin@x.com', UserRole.superuser)
+    response = client.post('/login', json={'login': 'admin@x.com',
+                                           'password': PASSWORD})
+    assert response.status_code == 200
+    return client
@@ -0,0 +1,44 @@
+from datetime import date
+
+import pytest
+
+from users import utils
+
+
+@pytest.mark.parametrize('today, days, ranges', [
+    # Обычный период внутри года
+    (date(2027, 6, 10), 7, [(610, 616)]),
+    # 29 февраля в невисокосный год празднуют 1 марта
+    (date(2027, 3, 1), 1, [(229, 301)]),
+    (date(2027, 2, 28), 1, [(228, 228)]),
+    # В високосный год 1 марта - только свой день
+    (date(2028, 3, 1), 1, [(301, 301)]),
+    # Переход через новый год
+    (date(2026, 12, 25), 10, [(1225, 1231), (101, 103)]),
+    (date(2026, 12, 31), 1, [(1231, 1231)]),
+    # Целый год
+    (date(2027, 3, 1), 365, [(229, 1231), (101, 228)]),
+    (date(2028, 2, 29), 365, [(229, 1231), (101, 227)]),
+])
+def test_get_birthdays_ranges(today, days, ranges):
+    assert utils.get_birthdays_ranges(today, days) == ranges
+
+
+@pytest.mark.parametrize('birthday, today, next_birthday', [
+    (date(1990, 6, 10), date(2027, 6, 10), date(2027, 6, 10)),
+    (date(1990, 1, 2), date(2026, 12, 25), date(2027, 1, 2)),
+    (date(1992, 2, 29), date(2027, 3, 1), date(2027, 3, 1)),
+    (date(1992, 2, 29), date(2028, 2, 1), date(2028, 2, 29)),
+])
+def test_get_next_birthday(birthday, today, next_birthday):
+    assert utils.get_next_birthday(birthday, today) == next_birthday
+
+
+def test_decode_birthdays_cursor():
+    ranges = utils.get_birthdays_ranges(date(2026, 12, 25), 10)
+    assert utils.decode_birthdays_cursor('102.7', ranges) == (102, 7)
+    # Курсор, выданный в другой день, не относится к текущим диапазонам
+    with pytest.raises(ValueError):
+        utils.decode_birthdays_cursor('1220.7', ranges)
+    with pytest.raises(ValueError):
+        utils.decode_birthdays_cursor('bad', ranges)
@@ -0,0 +1,85 @@
+import threading
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from users import utils
+from users.models import User, UserChangeCounter
+
+
+def add_user(db: Session, number: int) -> User:
+    user = User(first_name='Ivan', last_name='Ivanov',
+                email=f'user{number}@x.com', hashed_password='hash',
+                role='User')
+    db.add(user)
+    utils.mark_user_changed(user, db)
+    db.commit()
+    return user
+
+
+def poll(engine, cursor):
+    '''Один запрос читателя ленты: изменения и новый курсор'''
+    positions = utils.decode_changes_cursor(cursor)
+    with Session(engine) as db:
+        changes = utils.get_users_changes(positions, 100, db)
+    positions = utils.advance_changes_cursor(positions, changes)
+    return ([change[:2] for change in changes],
+            utils.encode_changes_cursor(positions))
+
+
+def test_feed_does_not_pass_uncommitted_change(engine):
+    with Session(engine) as db:
+        first, second = add_user(db, 1).id, add_user(db, 2).id
+
+    writer_a = Session(engine)
+    user = writer_a.get(User, first)
+    user.first_name = 'Petr'
+    utils.mark_user_changed(user, writer_a)
+    writer_a.flush()
+
+    # Писатель B начинает позже и должен ждать фиксации A
+    def write_b():
+        with Session(engine) as writer_b:
+            user = writer_b.get(User, second)
+            user.first_name = 'Petr'
+            utils.mark_user_changed(user, writer_b)
+            writer_b.commit()
+
+    thread = threading.Thread(target=write_b)
+    thread.start()
+    thread.join(timeout=0.5)
+    assert thread.is_alive()
+
+    # Читатель видит только зафиксированные изменения
+    changes, cursor = poll(engine, '0.0')
+    assert changes == [(1, first), (2, second)]
+    changes, cursor = poll(engine, cursor)
+    assert changes == []
+
+    writer_a.commit()
+    writer_a.close()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+    # Изменения обоих писателей приходят после курсора в порядке фиксации
+    changes, cursor = poll(engine, cursor)
+    assert changes == [(3, first), (4, second)]
+
+
+def test_feed_stops_at_horizon(engine):
+    with Session(engine) as db:
+        first, second = add_user(db, 1).id, add_user(db, 2).id
+        # Номер выделен, но счетчик еще не виден читателям
+        db.execute(update(UserChangeCounter).values(value=1))
+        db.commit()
+
+    changes, cursor = poll(engine, '0.0')
+    assert changes == [(1, first)]
+    assert cursor == f'1.{first}'
+
+    with Session(engine) as db:
+        db.execute(update(UserChangeCounter).values(value=2))
+        db.commit()
+
+    changes, cursor = poll(engine, cursor)
+    assert changes == [(2, second)]
@@ -0,0 +1,72 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from core.middlewares.compression import CompressionMiddleware
+
+
+MINIMUM_SIZE = 100
+LARGE_BODY = 'x' * (MINIMUM_SIZE * 10)
+
+
+def large(request):
+    return PlainTextResponse(LARGE_BODY)
+
+
+def small(request):
+    return PlainTextResponse('x' * (MINIMUM_SIZE - 1))
+
+
+def stream(request):
+    return StreamingResponse(iter([LARGE_BODY] * 3))
+
+
+@pytest.fixture
+def client():
+    app = Starlette(routes=[Route('/large', large), Route('/small', small),
+                            Route('/stream', stream)])
+    app.add_middleware(CompressionMiddleware, minimum_size=MINIMUM_SIZE)
+    return TestClient(app)
+
+
+def get(client, path: str, accept_encoding: str):
+    return client.get(path, headers={'Accept-Encoding': accept_encoding})
+
+
+def test_gzip_when_accepted(client):
+    response = get(client, '/large', 'gzip')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert int(response.headers['Content-Length']) < len(LARGE_BODY)
+    assert response.text == LARGE_BODY
+
+
+def test_small_response_is_not_compressed(client):
+    response = get(client, '/small', 'gzip')
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+
+@pytest.mark.parametrize('accept_encoding', ['', 'identity', 'gzip;q=0',
+                                             'deflate'])
+def test_not_compressed_when_gzip_not_accepted(client, accept_encoding):
+    response = get(client, '/large', accept_encoding)
+    assert 'Content-Encoding' not in response.headers
+    assert response.text == LARGE_BODY
+
+
+def test_stream_is_compressed_by_chunks(client):
+    response = get(client, '/stream', 'gzip')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert response.text == LARGE_BODY * 3
+
+
+def test_brotli_preferred_at_equal_quality(client):
+    pytest.importorskip('brotli')
+    response = get(client, '/large', 'gzip, br')
+    assert response.headers['Content-Encoding'] == 'br'
+    response = get(client, '/large', 'gzip, br;q=0.5')
+    assert response.headers['Content-Encoding'] == 'gzip'
@@ -0,0 +1,115 @@
+import asyncio
+from typing import Dict, Tuple
+
+import pytest
+from starlette.responses import PlainTextResponse
+
+from core.middlewares.limits import (
+    ConcurrencyLimitMiddleware,
+    classify_request,
+)
+
+
+class SlowApp:
+    '''Приложение, отвечающее только после release'''
+
+    def __init__(self) -> None:
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self, scope, receive, send) -> None:
+        self.started.set()
+        await self.release.wait()
+        await PlainTextResponse('ok')(scope, receive, send)
+
+
+async def request(app, method: str = 'GET',
+                  path: str = '/users') -> Tuple[int, Dict[str, str]]:
+    scope = {'type': 'http', 'method': method, 'path': path,
+             'headers': [], 'query_string': b''}
+    response = {}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = {key.decode().lower(): value.decode()
+                                   for key, value in message['headers']}
+
+    await app(scope, receive, send)
+    return response['status'], response['headers']
+
+
+def make_middleware(app, queue_size: int, queue_timeout: float = 5):
+    return ConcurrencyLimitMiddleware(app, limits={'read': 1},
+                                      queue_size=queue_size,
+                                      queue_timeout=queue_timeout)
+
+
+@pytest.mark.parametrize('method, path, route_class', [
+    ('POST', '/login', 'auth'),
+    ('POST', '/private/users/bulk-delete', 'bulk'),
+    ('POST', '/private/users/batch', 'bulk'),
+    ('GET', '/private/users/1', 'read'),
+    ('PATCH', '/private/users/1', 'write'),
+])
+def test_classify_request(method, path, route_class):
+    assert classify_request(method, path) == route_class
+
+
+def test_server_timing_header():
+    slow = SlowApp()
+    slow.release.set()
+    status, headers = asyncio.run(request(make_middleware(slow, 0)))
+    assert status == 200
+    queue, app = headers['server-timing'].split(', ')
+    assert queue.startswith('queue;dur=')
+    assert app.startswith('app;dur=')
+
+
+def test_request_is_shed_when_queue_is_full():
+    async def scenario():
+        slow = SlowApp()
+        middleware = make_middleware(slow, queue_size=0)
+        first = asyncio.create_task(request(middleware))
+        await slow.started.wait()
+        shed = await request(middleware)
+        slow.release.set()
+        return await first, shed
+
+    (status, _), (shed_status, shed_headers) = asyncio.run(scenario())
+    assert status == 200
+    assert shed_status == 503
+    assert shed_headers['retry-after'] == '5'
+
+
+def test_queued_request_waits_for_slot():
+    async def scenario():
+        slow = SlowApp()
+        middleware = make_middleware(slow, queue_size=1)
+        first = asyncio.create_task(request(middleware))
+        await slow.started.wait()
+        second = asyncio.create_task(request(middleware))
+        await asyncio.sleep(0.05)
+        slow.release.set()
+        return await first, await second
+
+    (status, _), (queued_status, _) = asyncio.run(scenario())
+    assert (status, queued_status) == (200, 200)
+
+
+def test_queued_request_is_shed_after_timeout():
+    async def scenario():
+        slow = SlowApp()
+        middleware = make_middleware(slow, queue_size=1, queue_timeout=0.05)
+        first = asyncio.create_task(request(middleware))
+        await slow.started.wait()
+        queued = await request(middleware)
+        slow.release.set()
+        await first
+        return queued
+
+    status, _ = asyncio.run(scenario())
+    assert status == 503
@@ -0,0 +1,33 @@
+from .conftest import PASSWORD
+
+
+def test_list_returns_only_requested_fields(admin_client, add_user):
+    add_user('user@x.com')
+    response = admin_client.get('/users', params={
+        'page': 1, 'size': 10, 'fields': 'email, id,email'})
+    assert response.status_code == 200
+    data = response.json()['data']
+    assert [sorted(user) for user in data] == [['email', 'id']] * 2
+    assert response.json()['meta']['pagination']['total'] == 2
+
+
+def test_private_user_projection(admin_client, add_user):
+    pk = add_user('user@x.com', city_id=1).id
+    response = admin_client.get(f'/private/users/{pk}', params={
+        'fields': 'city,is_admin'})
+    assert response.json() == {'city': 1, 'is_admin': False}
+    # Другой набор полей - другой ответ, а не ответ из кеша
+    response = admin_client.get(f'/private/users/{pk}', params={
+        'fields': 'email'})
+    assert response.json() == {'email': 'user@x.com'}
+    response = admin_client.get(f'/private/users/{pk}')
+    assert response.json()['additional_info'] is None
+
+
+def test_unknown_or_private_fields_are_rejected(client, add_user):
+    add_user('user@x.com')
+    client.post('/login', json={'login': 'user@x.com', 'password': PASSWORD})
+    for fields in ('unknown', 'email,additional_info', ','):
+        response = client.get('/users', params={
+            'page': 1, 'size': 10, 'fields': fields})
+        assert response.status_code == 400
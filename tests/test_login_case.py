@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from users.models import User
+from .conftest import PASSWORD
+
+
+def new_user(email: str):
+    return {'first_name': 'Ivan', 'last_name': 'Ivanov', 'email': email,
+            'is_admin': False, 'password': PASSWORD}
+
+
+def test_login_ignores_email_case(client, add_user):
+    add_user('User@x.com')
+    response = client.post('/login', json={'login': 'uSER@X.com',
+                                           'password': PASSWORD})
+    assert response.status_code == 200
+    assert response.json()['email'] == 'user@x.com'
+
+
+def test_case_variant_email_conflicts(admin_client, add_user):
+    add_user('User@x.com')
+    response = admin_client.post('/private/users', json=new_user('user@X.COM'))
+    assert response.status_code == 409
+
+    pk = admin_client.post('/private/users',
+                           json=new_user('other@x.com')).json()['id']
+    response = admin_client.patch(f'/private/users/{pk}',
+                                  json={'email': 'USER@x.com'})
+    assert response.status_code == 409
+    # Смена регистра собственного email не конфликтует
+    response = admin_client.patch(f'/private/users/{pk}',
+                                  json={'email': 'Other@x.com'})
+    assert response.status_code == 200
+
+
+def test_index_rejects_case_variant_duplicates(engine):
+    values = {'first_name': 'Ivan', 'last_name': 'Ivanov',
+              'hashed_password': 'hash', 'role': 'User'}
+    with engine.begin() as connection:
+        connection.execute(insert(User).values(email='User@x.com', **values))
+    with pytest.raises(IntegrityError):
+        with engine.begin() as connection:
+            connection.execute(
+                insert(User).values(email='user@x.com', **values)
+            )
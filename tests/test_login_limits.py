@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from auth.limiter import ConcurrencyGate
+from core.config import LOGIN_RATE_LIMIT_PER_IP, LOGIN_RATE_LIMIT_PER_LOGIN
+from .conftest import PASSWORD
+
+
+def login(client, email: str, password: str = 'wrong'):
+    return client.post('/login', json={'login': email, 'password': password})
+
+
+def test_login_limit_returns_retry_after(client, add_user):
+    add_user('user@x.com')
+    for _ in range(LOGIN_RATE_LIMIT_PER_LOGIN):
+        assert login(client, 'user@x.com').status_code == 401
+    # Лимит общий для всех вариантов регистра логина
+    response = login(client, 'USER@x.com', PASSWORD)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+
+def test_blocked_login_does_not_spend_ip_limit(client, add_user):
+    add_user('user@x.com')
+    add_user('other@x.com')
+    for _ in range(LOGIN_RATE_LIMIT_PER_LOGIN):
+        login(client, 'user@x.com')
+    for _ in range(LOGIN_RATE_LIMIT_PER_IP):
+        assert login(client, 'user@x.com').status_code == 429
+    assert login(client, 'other@x.com', PASSWORD).status_code == 200
+
+
+def test_gate_waits_for_free_slot():
+    gate = ConcurrencyGate('test.gate', 1, wait_timeout=5)
+    holding = threading.Event()
+
+    def hold_slot():
+        with gate.slot():
+            holding.set()
+            threading.Event().wait(0.2)
+
+    thread = threading.Thread(target=hold_slot)
+    thread.start()
+    holding.wait()
+    with gate.slot():
+        pass
+    thread.join()
+
+
+def test_gate_rejects_after_wait_timeout():
+    gate = ConcurrencyGate('test.gate', 1, wait_timeout=0.05)
+    with gate.slot():
+        with pytest.raises(HTTPException) as error:
+            with gate.slot():
+                pass
+    assert error.value.status_code == 429
+    assert error.value.headers['Retry-After'] == '1'
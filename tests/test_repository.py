@@ -0,0 +1,51 @@
+from sqlalchemy import insert, inspect
+from sqlalchemy.orm import Session
+
+from users import repository
+from users.models import City, User
+
+
+def add_user(engine) -> int:
+    with engine.begin() as connection:
+        connection.execute(insert(City).values(id=1, name='Moscow'))
+        return connection.scalar(insert(User).values(
+            first_name='Ivan', last_name='Ivanov', email='User@x.com',
+            hashed_password='hash', role='User', city_id=1,
+            additional_info='info', change_seq=1
+        ).returning(User.id))
+
+
+def test_auth_user_is_projection_without_password(engine):
+    pk = add_user(engine)
+    with Session(engine) as db:
+        auth_user = repository.get_auth_user(pk, db)
+        assert repository.get_auth_user(pk + 1, db) is None
+    assert auth_user.email == 'User@x.com'
+    assert 'hashed_password' not in auth_user._fields
+    assert 'additional_info' not in auth_user._fields
+
+
+def test_user_by_id_loads_only_requested_fields(engine):
+    pk = add_user(engine)
+    with Session(engine) as db:
+        db_user = repository.get_user_by_id(pk, db, ['email', 'city'])
+        unloaded = inspect(db_user).unloaded
+        assert 'email' not in unloaded and 'city_id' not in unloaded
+        assert 'additional_info' in unloaded
+        full_user = repository.get_user_by_id(pk, db)
+        assert full_user.additional_info == 'info'
+
+
+def test_user_by_login_returns_password_hash(engine):
+    pk = add_user(engine)
+    with Session(engine) as db:
+        db_user = repository.get_user_by_login('user@x.com', db)
+        assert repository.get_user_by_login('other@x.com', db) is None
+    assert (db_user.id, db_user.hashed_password) == (pk, 'hash')
+
+
+def test_city_by_id(engine):
+    add_user(engine)
+    with Session(engine) as db:
+        assert tuple(repository.get_city_by_id(1, db)) == (1, 'Moscow')
+        assert repository.get_city_by_id(2, db) is None
@@ -0,0 +1,135 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from core.database import USERS_SHARDED, shard_engines, shard_for
+from users.models import City, User
+from .conftest import PASSWORD
+
+
+SHARDS = 3
+
+sharded = pytest.mark.skipif(not USERS_SHARDED,
+                             reason='запускается из test_sharded_mode')
+
+
+def test_sharded_mode(tmp_path):
+    '''Тесты модуля в отдельном процессе с несколькими шардами в файлах
+    SQLite: шарды настраиваются при импорте приложения'''
+    if USERS_SHARDED:
+        pytest.skip('процесс уже запущен с шардами')
+    env = dict(os.environ, USERS_SHARDS=str(SHARDS),
+               DATABASES_DIR=str(tmp_path))
+    result = subprocess.run(
+        [sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider',
+         __file__],
+        cwd=os.path.join(os.path.dirname(__file__), '..'),
+        env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stdout[-5000:]
+
+
+def count_shard_users(shard_id: str) -> int:
+    with shard_engines[shard_id].connect() as connection:
+        return connection.scalar(select(func.count()).select_from(User))
+
+
+@sharded
+def test_users_are_spread_across_shards(admin_client, add_user):
+    ids = [add_user(f'user{number}@x.com').id for number in range(12)]
+    assert {shard_for(pk) for pk in ids} == set(shard_engines)
+    assert sum(map(count_shard_users, shard_engines)) == len(ids) + 1
+    for number, pk in enumerate(ids):
+        response = admin_client.get(f'/private/users/{pk}')
+        assert response.status_code == 200
+        assert response.json()['email'] == f'user{number}@x.com'
+
+
+@sharded
+def test_login_in_every_shard(client, add_user):
+    users = [add_user(f'user{number}@x.com') for number in range(12)]
+    logged_in_shards = set()
+    for user in users:
+        response = client.post('/login', json={'login': user.email.upper(),
+                                               'password': PASSWORD})
+        assert response.status_code == 200
+        assert client.get('/users/current').json()['email'] == user.email
+        logged_in_shards.add(shard_for(user.id))
+    assert logged_in_shards == set(shard_engines)
+
+
+@sharded
+def test_create_and_delete_across_shards(admin_client):
+    ids = []
+    for number in range(6):
+        response = admin_client.post('/private/users', json={
+            'first_name': 'Ivan', 'last_name': 'Ivanov',
+            'email': f'user{number}@x.com', 'is_admin': False,
+            'password': PASSWORD})
+        assert response.status_code == 201
+        ids.append(response.json()['id'])
+    assert len({shard_for(pk) for pk in ids}) > 1
+    # Занятый логин отклоняется независимо от шарда пользователя
+    response = admin_client.post('/private/users', json={
+        'first_name': 'Ivan', 'last_name': 'Ivanov',
+        'email': 'USER0@x.com', 'is_admin': False, 'password': PASSWORD})
+    assert response.status_code == 409
+
+    for pk in ids:
+        assert admin_client.delete(f'/private/users/{pk}').status_code == 204
+        assert admin_client.get(f'/private/users/{pk}').status_code == 404
+    # Логин удаленного пользователя освобождается
+    response = admin_client.post('/private/users', json={
+        'first_name': 'Ivan', 'last_name': 'Ivanov',
+        'email': 'user0@x.com', 'is_admin': False, 'password': PASSWORD})
+    assert response.status_code == 201
+
+
+@sharded
+def test_bulk_operations_across_shards(admin_client, add_user):
+    ids = [add_user(f'user{number}@x.com').id for number in range(9)]
+    bulk_filter = {'ids': ids}
+
+    response = admin_client.post('/private/users/bulk-update', json={
+        'filter': bulk_filter, 'values': {'additional_info': 'bulk'}})
+    assert response.json() == {'affected': len(ids), 'dry_run': False,
+                               'completed': True, 'error': None}
+    response = admin_client.post('/private/users/batch', json={'ids': ids})
+    infos = {user['additional_info'] for user in response.json()['data']}
+    assert infos == {'bulk'}
+
+    response = admin_client.post('/private/users/bulk-delete', json={
+        'filter': bulk_filter})
+    assert response.json()['affected'] == len(ids)
+    response = admin_client.post('/private/users/batch', json={'ids': ids})
+    assert response.json() == {'data': [], 'not_found': ids}
+    assert sum(map(count_shard_users, shard_engines)) == 1
+
+
+@sharded
+def test_city_added_after_start_reaches_shards(admin_client):
+    with shard_engines['0'].begin() as connection:
+        city_id = connection.scalar(
+            insert(City).values(name='Omsk').returning(City.id)
+        )
+    ids = []
+    for number in range(6):
+        response = admin_client.post('/private/users', json={
+            'first_name': 'Ivan', 'last_name': 'Ivanov',
+            'email': f'user{number}@x.com', 'city': city_id,
+            'is_admin': False, 'password': PASSWORD})
+        assert response.status_code == 201
+        ids.append(response.json()['id'])
+
+    for shard_id in {shard_for(pk) for pk in ids}:
+        with shard_engines[shard_id].connect() as connection:
+            name = connection.scalar(
+                select(City.name).where(City.id == city_id)
+            )
+        assert name == 'Omsk'
+    response = admin_client.get('/private/users?page=1&size=10')
+    cities_hint = response.json()['meta']['hint']['city']
+    assert {'id': city_id, 'name': 'Omsk'} in cities_hint
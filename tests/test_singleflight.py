@@ -0,0 +1,91 @@
+import threading
+import time
+
+from fastapi import HTTPException
+
+from core.metrics import metrics
+from core.singleflight import SingleFlight
+
+
+def wait_coalesced(name: str) -> None:
+    '''Ожидание, пока второй вызов не присоединится к первому'''
+    while not metrics.snapshot().get(f'{name}.coalesced'):
+        time.sleep(0.01)
+
+
+def test_follower_gets_leader_result():
+    flight = SingleFlight('test.coalesce', wait_timeout=5)
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def leader():
+        started.set()
+        release.wait()
+        return 'leader'
+
+    thread = threading.Thread(
+        target=lambda: results.append(flight.do('key', leader))
+    )
+    thread.start()
+    started.wait()
+    follower = threading.Thread(
+        target=lambda: results.append(flight.do('key', lambda: 'follower'))
+    )
+    follower.start()
+    wait_coalesced('test.coalesce')
+    release.set()
+    thread.join()
+    follower.join()
+    assert results == ['leader', 'leader']
+
+
+def test_follower_runs_itself_when_leader_hangs():
+    flight = SingleFlight('test.timeout', wait_timeout=0.1)
+    started, release = threading.Event(), threading.Event()
+
+    def leader():
+        started.set()
+        release.wait()
+        return 'leader'
+
+    thread = threading.Thread(target=flight.do, args=('key', leader))
+    thread.start()
+    started.wait()
+    try:
+        assert flight.do('key', lambda: 'follower') == 'follower'
+        assert metrics.snapshot()['test.timeout.timeouts'] == 1
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_follower_raises_own_copy_of_leader_error():
+    flight = SingleFlight('test.error', wait_timeout=5)
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def leader():
+        started.set()
+        release.wait()
+        raise HTTPException(status_code=404, detail='missing')
+
+    def call(fn):
+        try:
+            flight.do('key', fn)
+        except HTTPException as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=call, args=(leader,))
+    thread.start()
+    started.wait()
+    follower = threading.Thread(target=call, args=(lambda: 'follower',))
+    follower.start()
+    wait_coalesced('test.error')
+    release.set()
+    thread.join()
+    follower.join()
+    leader_error, follower_error = errors
+    assert follower_error is not leader_error
+    assert follower_error.__cause__ is leader_error
+    assert follower_error.status_code == 404
+    assert follower_error.detail == 'missing'
@@ -0,0 +1,32 @@
+from core.config import BATCH_MAX_IDS
+from .conftest import PASSWORD
+
+
+def test_batch_keeps_order_and_reports_not_found(admin_client, add_user):
+    first = add_user('first@x.com').id
+    second = add_user('second@x.com').id
+    missing = second + 100
+
+    response = admin_client.post('/private/users/batch', json={
+        'ids': [second, missing, first, second]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [user['id'] for user in body['data']] == [second, first]
+    assert body['data'][0]['email'] == 'second@x.com'
+    assert body['not_found'] == [missing]
+
+
+def test_batch_limits_ids_count(admin_client):
+    response = admin_client.post('/private/users/batch', json={
+        'ids': list(range(1, BATCH_MAX_IDS + 2))})
+    assert response.status_code == 422
+    response = admin_client.post('/private/users/batch', json={'ids': []})
+    assert response.status_code == 422
+
+
+def test_batch_is_for_admins_only(client, add_user):
+    pk = add_user('user@x.com').id
+    client.post('/login', json={'login': 'user@x.com', 'password': PASSWORD})
+    response = client.post('/private/users/batch', json={'ids': [pk]})
+    assert response.status_code == 403
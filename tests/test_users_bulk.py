@@ -0,0 +1,50 @@
+def bulk_update(client, dry_run: bool, **values):
+    return client.post('/private/users/bulk-update', json={
+        'filter': {'city': 1}, 'values': values, 'dry_run': dry_run})
+
+
+def get_cities(client):
+    response = client.get('/private/users', params={'page': 1, 'size': 10})
+    ids = [user['id'] for user in response.json()['data']]
+    response = client.post('/private/users/batch', json={'ids': ids})
+    return sorted(user['city'] or 0 for user in response.json()['data'])
+
+
+def test_dry_run_counts_without_changes(admin_client, add_user):
+    for number in range(3):
+        add_user(f'user{number}@x.com', city_id=1)
+    add_user('other@x.com', city_id=2)
+
+    response = bulk_update(admin_client, True, city=2)
+    assert response.status_code == 200
+    assert response.json() == {'affected': 3, 'dry_run': True,
+                               'completed': True, 'error': None}
+    assert get_cities(admin_client) == [0, 1, 1, 1, 2]
+
+    response = bulk_update(admin_client, False, city=2)
+    assert response.json()['affected'] == 3
+    assert get_cities(admin_client) == [0, 2, 2, 2, 2]
+
+
+def test_bulk_delete_dry_run(admin_client, add_user):
+    for number in range(2):
+        add_user(f'user{number}@x.com', city_id=1)
+    bulk_filter = {'filter': {'city': 1, 'is_admin': False}}
+
+    response = admin_client.post('/private/users/bulk-delete',
+                                 json={**bulk_filter, 'dry_run': True})
+    assert response.json()['affected'] == 2
+    response = admin_client.post('/private/users/bulk-delete',
+                                 json=bulk_filter)
+    assert response.json()['affected'] == 2
+    response = admin_client.post('/private/users/bulk-delete',
+                                 json={**bulk_filter, 'dry_run': True})
+    assert response.json()['affected'] == 0
+
+
+def test_bulk_update_validation(admin_client):
+    assert bulk_update(admin_client, False, city=99).status_code == 409
+    assert bulk_update(admin_client, False).status_code == 422
+    response = admin_client.post('/private/users/bulk-delete',
+                                 json={'filter': {}})
+    assert response.status_code == 422
@@ -0,0 +1,57 @@
+from core.cache import ResponseCache
+from core.metrics import metrics
+from .conftest import PASSWORD
+
+
+def get_page(client, **params):
+    return client.get('/private/users', params={'page': 1, 'size': 10,
+                                                **params})
+
+
+def cache_hits() -> float:
+    return metrics.snapshot().get('users.pages_cache.hits', 0)
+
+
+def test_repeated_page_is_served_from_cache(admin_client):
+    first = get_page(admin_client)
+    hits = cache_hits()
+    second = get_page(admin_client)
+    assert cache_hits() == hits + 1
+    assert second.content == first.content
+    # Страницы по курсору в кеш не попадают
+    get_page(admin_client, after=0)
+    get_page(admin_client, after=0)
+    assert cache_hits() == hits + 1
+
+
+def test_write_invalidates_cached_pages(admin_client):
+    assert get_page(admin_client).json()['meta']['pagination']['total'] == 1
+    response = admin_client.post('/private/users', json={
+        'first_name': 'Ivan', 'last_name': 'Ivanov', 'email': 'user@x.com',
+        'is_admin': False, 'password': PASSWORD})
+    assert response.status_code == 201
+    assert get_page(admin_client).json()['meta']['pagination']['total'] == 2
+
+
+def test_page_rendered_before_invalidation_is_not_stored():
+    cache = ResponseCache('test.cache', max_bytes=100, ttl=30)
+    generation = cache.generation
+    cache.clear()
+    cache.set('key', b'stale', generation)
+    assert cache.get('key') is None
+
+
+def test_least_recently_used_pages_are_evicted():
+    cache = ResponseCache('test.cache', max_bytes=10, ttl=30)
+    cache.set('first', b'12345', cache.generation)
+    cache.set('second', b'12345', cache.generation)
+    assert cache.get('first') == b'12345'
+    cache.set('third', b'12345', cache.generation)
+    assert cache.get('second') is None
+    assert cache.get('first') == b'12345'
+
+
+def test_expired_page_is_not_served():
+    cache = ResponseCache('test.cache', max_bytes=100, ttl=0)
+    cache.set('key', b'body', cache.generation)
+    assert cache.get('key') is None
@@ -0,0 +1,72 @@
+from collections import Counter, defaultdict
+from datetime import date
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from users import stats, utils
+from users.models import User, UserRole
+
+
+def add_user(db: Session, number: int, city_id=None, birthday=None) -> User:
+    user = User(first_name='Ivan', last_name='Ivanov',
+                email=f'user{number}@x.com', hashed_password='hash',
+                role=UserRole.basic, city_id=city_id, birthday=birthday)
+    utils.add_in_db(user, db)
+    return user
+
+
+def count_from_users(db: Session):
+    '''Те же счетчики, посчитанные GROUP BY по таблице users'''
+    expected = defaultdict(Counter)
+    rows = db.execute(
+        select(User.city_id, User.role, User.birthday, func.count())
+        .group_by(User.city_id, User.role, User.birthday)
+    )
+    for city_id, role, birthday, count in rows:
+        for dimension, key in stats.make_user_stats_keys(
+            city_id, role, birthday
+        ):
+            expected[dimension][key] += count
+    return {dimension: +counter for dimension, counter in expected.items()}
+
+
+def stored_stats(db: Session):
+    return {dimension: +counter
+            for dimension, counter in stats.get_users_stats(db).items()}
+
+
+def test_stats_match_users_after_changes(engine):
+    with Session(engine, autoflush=False) as db:
+        users = [add_user(db, number, city_id=number % 3 or None,
+                          birthday=date(1990, number % 12 + 1, 10))
+                 for number in range(10)]
+        users[0].city_id = 2
+        users[0].role = UserRole.superuser
+        utils.update_in_db(users[0], db)
+        utils.delete_in_db(users[1], db)
+        utils.bulk_update_in_db([User.city_id == 1], {'city_id': 2}, db)
+        utils.bulk_delete_in_db([User.city_id.is_(None)], db)
+        assert stored_stats(db) == count_from_users(db)
+
+
+def test_concurrent_updates_do_not_drift(engine):
+    with Session(engine, autoflush=False) as db:
+        user_id = add_user(db, 1, city_id=1).id
+    # Оба писателя загрузили пользователя до фиксации первого из них
+    writer_a = Session(engine, autoflush=False)
+    writer_b = Session(engine, autoflush=False)
+    user_a = writer_a.get(User, user_id)
+    user_b = writer_b.get(User, user_id)
+    user_a.city_id = 2
+    utils.update_in_db(user_a, writer_a)
+    # Загруженное вторым писателем значение города устарело
+    user_b.city_id = 3
+    user_b.role = UserRole.superuser
+    utils.update_in_db(user_b, writer_b)
+    writer_a.close()
+    writer_b.close()
+
+    with Session(engine, autoflush=False) as db:
+        assert stored_stats(db) == count_from_users(db)
+        assert stored_stats(db)['city'] == Counter({'3': 1})